@@ -0,0 +1,250 @@
+"""
+Streamlit'siz öneri servisi (kiosk / e-ticaret için).
+
+    python api_grlsz.py [--xlsx "Kod _n_ son grlsz.xlsx" | --url DATA_URL] [--port 8502] [--workers 8]
+
+    POST /recommend  {"gender": "Erkek", "surface": "Road", "goal": "Yaris", "freq": "3 ve daha az",
+                      "distance": "0-20 km", "injury": "Yok", "pronation": "Hayir"}
+    GET  /recommend?gender=Erkek&surface=Road&...
+    POST /delta      {"upserts": [{"MR": "FD8311.600", "Price": 5499}], "deletes": ["DV4129.001"]}
+                     (var olan SKU'da yalnızca verilen alanlar değişir; yeni SKU tüm sütunları verir)
+                     (Authorization: Bearer <--delta-token>; token verilmezse kapalı)
+    GET  /healthz
+    GET  /metrics   (Prometheus text: aşama süreleri, satır/byte sayaçları)
+
+Yanıt: {"count": N, "columns": [...B/C/D/H/K/L/M/N/O/P...], "rows": [{...}, ...]}
+Katalog açılışta bir kez yüklenir; her cevap kombinasyonunun JSON'u ilk istekte üretilip saklanır.
+Keep-alive bağlantısı bir worker'ı tutar: IDLE_TIMEOUT saniye boş kalan ya da havuzda sırada bekleyen
+bağlantı varken boşta duran bağlantı kapatılır; sıra varken yanıtlar "Connection: close" ile gider.
+"""
+import argparse, hmac, json, os, select, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import pandas as pd
+import helpers_grlsz as h
+
+DEFAULT_WORKERS = 8
+IDLE_TIMEOUT = 5.0  # seconds a keep-alive connection may sit idle while holding a worker
+IDLE_POLL = 0.05  # idle connections re-check the accept queue this often
+QUEUE_GRACE = 0.05  # a connection queued longer than this means the pool is saturated
+MAX_BODY_BYTES = 1024 * 1024  # larger POST bodies get 413 without being read
+
+class RecommendationService:
+    def __init__(self, catalog: h.Catalog, delta_token: str = None):
+        self.catalog = catalog
+        catalog.ensure_answers()
+        self.delta_token = delta_token
+        self._payloads = {}  # (catalog version, AnswerTable code) -> encoded JSON body
+        self._lock = threading.Lock()
+        self._delta_lock = threading.Lock()
+
+    def validate(self, params: dict) -> dict:
+        clean = {}
+        for name, options in h.ANSWER_OPTIONS.items():
+            value = params.get(name)
+            if value not in options:
+                raise ValueError(f"{name} must be one of {list(options)}")
+            clean[name] = value
+        return clean
+
+    def recommend(self, params: dict) -> bytes:
+        params = self.validate(params)
+        catalog = self.catalog  # one read: a delta swaps the reference, never mutates the catalog
+        code = (catalog.version, catalog.answers.code(params))
+        body = self._payloads.get(code)
+        if body is None:
+            filtered = catalog.query(params)
+            cols = [c for c in catalog.out_cols if c in filtered.columns]
+            rows = json.loads(filtered[cols].to_json(orient="records", force_ascii=False))
+            body = json.dumps({"count": len(filtered), "columns": [str(c) for c in cols], "rows": rows},
+                              ensure_ascii=False).encode("utf-8")
+            with self._lock:
+                self._payloads[code] = body
+        return body
+
+    def apply_delta(self, payload: dict) -> dict:
+        """
+        SKU deltası (h.apply_delta); yeni katalog tek atamayla yayınlanır, eski sürümün yanıtları bırakılır.
+        Var olan SKU'nun satırında yalnızca verilen alanlar değişir; geçersiz delta ValueError (400).
+        """
+        upserts, deletes = payload.get("upserts") or [], payload.get("deletes") or []
+        if not isinstance(upserts, list) or not all(isinstance(r, dict) for r in upserts):
+            raise ValueError("upserts must be a list of row objects")
+        if not isinstance(deletes, list) or not all(isinstance(d, str) for d in deletes):
+            raise ValueError("deletes must be a list of SKU strings")
+        with self._delta_lock:
+            base = self.catalog
+            names = {str(c): c for c in base.raw.columns}  # JSON keys are strings; answer columns are ints
+            unknown = sorted({k for r in upserts for k in r} - set(names))
+            if unknown:
+                raise ValueError(f"unknown columns: {', '.join(unknown)}")
+            rows = [{names[k]: v for k, v in r.items()} for r in upserts]  # partial rows: h.apply_delta merges
+            nxt = h.apply_delta(base, rows, deletes)
+            self.catalog = nxt
+            with self._lock:
+                self._payloads = {}
+        return {"version": nxt.version, "rows": len(nxt.norm), "upserts": len(upserts), "deletes": len(deletes)}
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    timeout = IDLE_TIMEOUT  # idle keep-alive read times out -> connection closed, worker freed
+    service: RecommendationService = None
+
+    def handle(self):
+        self.close_connection = False
+        while not self.close_connection and self._await_request():
+            self.handle_one_request()
+
+    def _buffered(self) -> bool:
+        """Okunmuş ama işlenmemiş (pipelined) byte var mı; soket geçici olarak bloklamasız."""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def _await_request(self) -> bool:
+        """Sonraki isteği bekler; IDLE_TIMEOUT dolarsa ya da sırada bağlantı varsa False (worker serbest kalır)."""
+        if self._buffered():
+            return True
+        deadline = time.monotonic() + IDLE_TIMEOUT
+        while not select.select([self.connection], [], [], IDLE_POLL)[0]:
+            if self.server.saturated() or time.monotonic() > deadline:
+                return False
+        return True
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json; charset=utf-8", close: bool = False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if close or self.server.saturated():
+            self.send_header("Connection", "close")  # also sets close_connection
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, close: bool = False):
+        self._send(status, json.dumps({"error": message}, ensure_ascii=False).encode("utf-8"), close=close)
+
+    def _recommend(self, params: dict):
+        try:
+            self._send(200, self.service.recommend(params))
+        except ValueError as e:
+            self._error(400, str(e))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/healthz":
+            cat = self.service.catalog
+            self._send(200, json.dumps({"status": "ok", "version": cat.version, "rows": len(cat.norm)}).encode("utf-8"))
+        elif parts.path == "/metrics":
+            self._send(200, h.metrics_text().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif parts.path == "/recommend":
+            self._recommend(dict(parse_qsl(parts.query)))
+        else:
+            self._error(404, "not found")
+
+    def _authorized(self) -> bool:
+        token = self.service.delta_token
+        return bool(token) and hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ("/recommend", "/delta"):
+            self._error(404, "not found")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._error(400, "invalid Content-Length", close=True)  # body length unknown: cannot keep the connection
+            return
+        if length > MAX_BODY_BYTES:
+            self._error(413, f"body larger than {MAX_BODY_BYTES} bytes", close=True)  # unread body: close
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._error(400, "body must be JSON")
+            return
+        if not isinstance(params, dict):
+            self._error(400, "body must be a JSON object")
+            return
+        if path == "/recommend":
+            self._recommend(params)
+        elif not self._authorized():
+            self._error(403, "delta updates need a valid token" if self.service.delta_token else "delta updates disabled")
+        else:
+            try:
+                body = self.service.apply_delta(params)
+            except (ValueError, KeyError) as e:
+                self._error(400, str(e))
+                return
+            self._send(200, json.dumps(body).encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+class PooledHTTPServer(HTTPServer):
+    """Bağlantıları sabit boyutlu bir thread havuzunda işler."""
+
+    def __init__(self, addr, handler, workers: int):
+        super().__init__(addr, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self._queued = {}  # accepted connection -> time it was handed to the pool, until a worker picks it up
+
+    def saturated(self) -> bool:
+        """Havuzda QUEUE_GRACE'ten uzun süredir worker bekleyen bağlantı var mı."""
+        limit = time.monotonic() - QUEUE_GRACE
+        return any(t < limit for t in list(self._queued.values()))
+
+    def process_request(self, request, client_address):
+        self._queued[request] = time.monotonic()
+        self.pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        self._queued.pop(request, None)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+def make_server(catalog: h.Catalog, host="127.0.0.1", port=8502, workers=DEFAULT_WORKERS,
+                delta_token: str = None) -> PooledHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"service": RecommendationService(catalog, delta_token)})
+    return PooledHTTPServer((host, port), handler, workers)
+
+def main():
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--xlsx", default="Kod _n_ son grlsz.xlsx")
+    src.add_argument("--url")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--delta-token", default=os.environ.get("GRLSZ_DELTA_TOKEN"),
+                    help="POST /delta için Bearer token (varsayılan GRLSZ_DELTA_TOKEN; yoksa /delta kapalı)")
+    args = ap.parse_args()
+
+    catalog = h.catalog_from_url(args.url) if args.url else h.catalog_from_path(args.xlsx)
+    server = make_server(catalog, args.host, args.port, args.workers, args.delta_token)
+    print(f"Serving {len(catalog.norm)} rows (catalog {catalog.version}) on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
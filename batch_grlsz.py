@@ -0,0 +1,94 @@
+"""
+Toplu öneri: müşteri cevap dosyası (CSV / Parquet) -> müşteri başına önerilen SKU'lar.
+
+    python batch_grlsz.py answers.csv out.csv [--xlsx "Kod _n_ son grlsz.xlsx"] [--chunksize 100000]
+
+Girdi sütunları: gender, surface, goal, freq, distance, injury, pronation (diğer sütunlar aynen
+aktarılır). Çıktıya recommended_count ve recommended_skus (";" ile ayrılmış, varsayılan H sütunu)
+eklenir. Dosya parça parça okunup yazılır; aynı cevap kombinasyonu yalnızca bir kez hesaplanır.
+Eksik / geçersiz cevaplı satırlarda recommended_count boş kalır.
+"""
+import argparse, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import helpers_grlsz as h
+
+def read_chunks(path: str, chunksize: int):
+    if Path(path).suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+
+class ChunkWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = Path(path).suffix.lower() == ".parquet"
+        self._writer = None
+        self._first = True
+
+    def write(self, frame: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def recommend_chunks(catalog: h.Catalog, chunks, sku_col, sep=";"):
+    """Her parça için cevap kodlarını çıkarır; her farklı kod için SKU listesi bir kez kurulur."""
+    answers = catalog.ensure_answers()
+    skus = catalog.norm[sku_col].astype(str).to_numpy()
+    by_code = {}  # answer code -> (count, "sku;sku;...")
+    for chunk in chunks:
+        codes = answers.codes(chunk)
+        uniq, inverse = np.unique(codes, return_inverse=True)
+        counts = np.empty(len(uniq), dtype=object)
+        lists = np.empty(len(uniq), dtype=object)
+        for i, code in enumerate(uniq):
+            if code < 0:
+                counts[i], lists[i] = None, ""
+                continue
+            if code not in by_code:
+                pos = answers.positions_for_code(code)
+                by_code[code] = (len(pos), sep.join(skus[pos]))
+            counts[i], lists[i] = by_code[code]
+        out = chunk.copy()
+        out["recommended_count"] = pd.array(counts[inverse], dtype="Int64")
+        out["recommended_skus"] = lists[inverse]
+        yield out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("answers")
+    ap.add_argument("output")
+    ap.add_argument("--xlsx", default="Kod _n_ son grlsz.xlsx")
+    ap.add_argument("--sku-column", default="H", help="Excel sütun harfi (varsayılan H = SKU/renk kodu)")
+    ap.add_argument("--chunksize", type=int, default=100_000)
+    args = ap.parse_args()
+
+    catalog = h.catalog_from_path(args.xlsx)
+    sku_col = h.excel_letter_to_name(catalog.raw.columns, args.sku_column)
+    writer = ChunkWriter(args.output)
+    rows = 0
+    t0 = time.perf_counter()
+    try:
+        for out in recommend_chunks(catalog, read_chunks(args.answers, args.chunksize), sku_col):
+            writer.write(out)
+            rows += len(out)
+    finally:
+        writer.close()
+    print(f"{rows} rows -> {args.output} ({time.perf_counter() - t0:.2f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,781 @@
+"""
+Basit performans ölçümleri.
+
+    python bench_grlsz.py normalize [--xlsx "Kod _n_ son grlsz.xlsx"] [--scale 100]
+    python bench_grlsz.py fetch     [--xlsx "Kod _n_ son grlsz.xlsx"]
+    python bench_grlsz.py memory    [--xlsx "Kod _n_ son grlsz.xlsx"]
+    python bench_grlsz.py clicks    [--app running_shoes_app_grlsz_wizard.py] [--clicks 24]
+    python bench_grlsz.py suite     [--sizes 1000,10000,100000,1000000] [--load-max 100000] [--out sonuc.json]
+    python bench_grlsz.py compare   eski.json yeni.json [--threshold 1.15]
+    python bench_grlsz.py check     [--xlsx "Kod _n_ son grlsz.xlsx"] [--workdir ...]
+
+suite: gerçek şemada sentetik katalog üretir; load / normalize / filtre (128 kombinasyon) /
+CSV export aşamalarını ayrı ölçer ve commit bilgisiyle JSON'a yazar. compare iki JSON'u
+aşama aşama karşılaştırır; threshold'dan yavaş aşama varsa çıkış kodu 1'dir. clicks uygulamayı
+headless başlatır ve sihirbazda İleri / Geri tıklamalarının gecikmesini ölçer. check hızlı yolları
+referans / kaba kuvvet sonuçlarıyla karşılaştırır; fark varsa çıkış kodu 1'dir.
+"""
+import argparse, itertools, json, os, platform, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import helpers_grlsz as h
+
+DEFAULT_XLSX = "Kod _n_ son grlsz.xlsx"
+
+def timeit(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+# Reference: the original hard-coded per-cell mappers that rules_grlsz.json replaced
+def map_gender(x):
+    t = h.norm_token(x)
+    if "erkek" in t or "male" in t:
+        return "erkek"
+    if "kadin" in t or "female" in t:
+        return "kadin"
+    return None
+
+def map_surface(x):
+    t = h.norm_token(x)
+    if "yol" in t or "road" in t:
+        return "road"
+    if "patika" in t or "trail" in t:
+        return "trail"
+    return None
+
+def map_goal(x):
+    t = h.norm_token(x)
+    if "yaris" in t or "race" in t:
+        return "yaris"
+    if "antrenman" in t or "training" in t:
+        return "antrenman"
+    return None
+
+def map_durability_long(x):
+    t = h.norm_token(x)
+    return ("uzun" in t) and ("omurlu" in t or "omur" in t)
+
+def map_distance_group(x):
+    t = h.norm_token(x)
+    if ("orta" in t and "mesafe" in t) or ("medium" in t):
+        return "orta mesafe"
+    if ("uzun" in t and "mesafe" in t) or ("long" in t):
+        return "uzun mesafe"
+    if ("kisa" in t and "mesafe" in t) or ("short" in t):
+        return "kisa mesafe"
+    return None
+
+def map_injury_ok(x):
+    try:
+        xv = float(x)
+        return abs(xv - 1.2) < 1e-6
+    except Exception:
+        t = h.norm_token(str(x))
+        return ("evet" in t) or ("uygun" in t) or ("yes" in t)
+
+def map_pronation_yes(x):
+    t = h.norm_token(x)
+    return ("evet" in t) or (t == "1") or ("yes" in t)
+
+# (output column, source column, cast to str first, mapper)
+REFERENCE_COLUMNS = [
+    ("q1", 1, True, map_gender),
+    ("q2", 2, True, map_surface),
+    ("q3", 3, True, map_goal),
+    ("q4_is_long", 4, True, map_durability_long),
+    ("q5_group", 5, True, map_distance_group),
+    ("q6_injury_ok", 6, False, map_injury_ok),
+    ("q7_pronation_yes", 7, True, map_pronation_yes),
+]
+
+def normalize_rowwise(df: pd.DataFrame) -> pd.DataFrame:
+    # Reference: the original per-row Series.map implementation
+    dfn = df.copy()
+    for out, key, as_str, fn in REFERENCE_COLUMNS:
+        c = h.pick(dfn, key)
+        if as_str:
+            c = c.astype(str)
+        dfn[out] = c.map(fn)
+    return dfn
+
+def bench_normalize(df: pd.DataFrame, label: str, repeat: int):
+    view = h.build_normalized_view(df).drop(columns=list(h.SPEC_COLUMNS))
+    pd.testing.assert_frame_equal(view, normalize_rowwise(df).astype(h.NORMALIZED_DTYPES))
+    q_cols = h.Q_COLUMNS  # categorical source columns must normalize identically
+    pd.testing.assert_frame_equal(h.build_normalized_view(h.compact_columns(df))[q_cols], h.build_normalized_view(df)[q_cols])
+    t_row = timeit(lambda: normalize_rowwise(df), repeat)
+    t_vec = timeit(lambda: h.build_normalized_view(df), repeat)
+    print(f"{label:<12} rows={len(df):>8}  rowwise={t_row*1000:9.2f} ms  "
+          f"vectorized={t_vec*1000:9.2f} ms  speedup={t_row/t_vec:6.1f}x")
+
+def frame_bytes(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(deep=True, index=False).sum())
+
+def bench_memory(df: pd.DataFrame):
+    """Eski düzen (ham + tam kopya + object q sütunları) ile kompakt düzenin satır başına byte'ı."""
+    q_cols = list(h.NORMALIZED_DTYPES)
+    old_norm = normalize_rowwise(df)
+    before = {"raw": frame_bytes(df), "norm copy": frame_bytes(old_norm)}
+    raw = h.compact_columns(df)
+    dfn = h.build_normalized_view(raw)
+    after = {"raw": frame_bytes(raw), "q1..q7": frame_bytes(dfn[q_cols])}
+    n = len(df)
+    for label, parts in [("before", before), ("after", after)]:
+        total = sum(parts.values())
+        detail = ", ".join(f"{k} {v / n:.0f}" for k, v in parts.items())
+        print(f"{label:<7} {total:>10} bytes  {total / n:8.1f} bytes/row  ({detail})")
+    print(f"q1..q7 alone: {frame_bytes(old_norm[q_cols]) / n:.1f} -> {after['q1..q7'] / n:.1f} bytes/row; "
+          f"categorical: {', '.join(str(c) for c in raw.columns if isinstance(raw[c].dtype, pd.CategoricalDtype))}")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Yerel DATA_URL taklidi: ETag destekli, istek ve gönderilen byte sayar."""
+    body = b""
+    etag = '"v1"'
+    requests = 0
+    not_modified = 0
+    bytes_served = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests += 1
+        if self.headers.get("If-None-Match") == cls.etag:
+            cls.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", cls.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", cls.etag)
+        self.send_header("Content-Length", str(len(cls.body)))
+        self.end_headers()
+        self.wfile.write(cls.body)
+        cls.bytes_served += len(cls.body)
+
+    def log_message(self, *args):
+        pass
+
+def serve_stand_in(body: bytes):
+    StandInHandler.body = body
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/catalog.xlsx"
+
+def bench_fetch(xlsx: str, rounds: int = 5):
+    with open(xlsx, "rb") as fh:
+        server, url = serve_stand_in(fh.read())
+    try:
+        def report(label, catalogs):
+            same = all(c is catalogs[0] for c in catalogs)
+            print(f"{label:<28} requests={StandInHandler.requests:<3} 304={StandInHandler.not_modified:<3} "
+                  f"bytes={StandInHandler.bytes_served:<8} same_catalog={same}")
+
+        t0 = time.perf_counter()
+        cats = [h.catalog_from_url(url, ttl=0) for _ in range(rounds)]
+        report(f"ttl=0 x{rounds} ({(time.perf_counter()-t0)*1000:.0f} ms)", cats)
+        cats += [h.catalog_from_url(url, ttl=60) for _ in range(rounds)]
+        report(f"ttl=60 x{rounds}", cats)
+        StandInHandler.etag = '"v2"'  # same bytes, new validator -> one full download, no re-parse
+        cats.append(h.catalog_from_url(url, ttl=0))
+        report("etag changed", cats)
+    finally:
+        server.shutdown()
+
+# -----------------------------
+# Wizard click latency (real Streamlit server over its websocket)
+# -----------------------------
+def bench_clicks(app: str, clicks: int, port: int) -> dict:
+    """
+    Tarayıcı gibi websocket'ten 'İleri →' / '← Geri' tıklar; tıklamadan script_finished'a kadar
+    geçen süreyi ölçer. Fragment içindeki düğmeler kendi fragment_id'siyle tetiklenir.
+    """
+    import urllib.request
+    from websockets.sync.client import connect
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    proc = subprocess.Popen([sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+                             "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(300):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+            def run(widget_id=None, fragment_id=""):
+                msg = BackMsg()
+                msg.rerun_script.query_string = ""
+                msg.rerun_script.fragment_id = fragment_id
+                if widget_id:
+                    msg.rerun_script.widget_states.widgets.add(id=widget_id, trigger_value=True)
+                t0 = time.perf_counter()
+                ws.send(msg.SerializeToString())
+                buttons, n_deltas = {}, 0
+                while True:
+                    fwd = ForwardMsg()
+                    fwd.ParseFromString(ws.recv())
+                    kind = fwd.WhichOneof("type")
+                    if kind == "delta":
+                        n_deltas += 1
+                        el = fwd.delta.new_element
+                        if fwd.delta.WhichOneof("type") == "new_element" and el.WhichOneof("type") == "button":
+                            buttons[el.button.label] = (el.button.id, fwd.delta.fragment_id)
+                    elif kind == "script_finished":
+                        return time.perf_counter() - t0, buttons, n_deltas
+
+            first, buttons, _ = run()
+            lat, deltas, forward = [], [], True
+            for _ in range(clicks):
+                label = "İleri →" if forward else "← Geri"
+                if label not in buttons:
+                    forward = not forward
+                    label = "İleri →" if forward else "← Geri"
+                seconds, buttons, n = run(*buttons[label])
+                lat.append(seconds)
+                deltas.append(n)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    lat = np.array(lat) * 1000
+    return {"app": app, "first_run_ms": round(first * 1000, 1), "clicks": int(lat.size),
+            "p50_ms": round(float(np.percentile(lat, 50)), 1), "p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "mean_ms": round(float(lat.mean()), 1), "deltas_per_click": round(float(np.mean(deltas)), 1)}
+
+# -----------------------------
+# Synthetic catalog (Data sheet schema)
+# -----------------------------
+SYNTH_VERSION = 1  # bump when the generator changes; cached workbooks are keyed on it
+SYNTH_BRANDS = ["NIKE", "ADIDAS", "ASICS", "BROOKS", "HOKA", "NEW BALANCE", "PUMA", "SALOMON"]
+SYNTH_FAMILIES = ["PEGASUS", "VAPORFLY", "ADIZERO ADIOS", "ADISTAR", "GEL-NIMBUS", "GEL-KAYANO", "CLIFTON",
+                  "SPEEDGOAT", "GHOST", "CALDERA", "FRESH FOAM 1080", "DEVIATE NITRO", "SPEEDCROSS"]
+SYNTH_DROPS = ["4 MM", "5 MM", "6 MM", "6,5 MM", "7 MM", "8 MM", "9 MM", "10 MM", "12 MM", "0 MM"]
+
+def synthetic_catalog(n: int, seed: int = 0) -> pd.DataFrame:
+    """Data sayfası şemasında n satır; SKU (MR) benzersiz, cevap sütunları Activity/Pronation ile tutarlı."""
+    rng = np.random.default_rng(seed)
+    n_models = max(10, n // 4)
+    model = rng.integers(0, n_models, n)
+    brand = np.array(SYNTH_BRANDS)[model % len(SYNTH_BRANDS)]
+    family = np.array(SYNTH_FAMILIES)[(model // len(SYNTH_BRANDS)) % len(SYNTH_FAMILIES)]
+    version = model // (len(SYNTH_BRANDS) * len(SYNTH_FAMILIES)) % 15 + 1
+    men = rng.random(n) < 0.55
+    road = rng.random(n) < 0.7
+    race = rng.random(n) < 0.3
+    over = rng.random(n) < 0.25
+    model_code = pd.Series(model).map("{:06X}".format).to_numpy(dtype=object)
+    color = pd.Series(np.arange(n) % 1000).map("{:03d}".format).to_numpy(dtype=object)
+    activity = np.where(road, "ROAD", "TRAIL").astype(object) + " - " + np.where(race, "RACING", "TRAINING").astype(object)
+    return pd.DataFrame({
+        "Category": "AYAKKABI",
+        "Brand": brand,
+        "Gender": np.where(men, "MEN", "WOMEN"),
+        "ModelName": pd.Series(family).str.title().to_numpy(dtype=object) + " " + version.astype(str).astype(object),
+        "Family": family,
+        "Model": model_code,
+        "Color": color,
+        "MR": model_code + "." + color + "." + pd.Series(np.arange(n) // 1000).astype(str).to_numpy(dtype=object),
+        "DUMMY": "a",
+        "Price": rng.integers(30, 160, n) * 100 - 1,
+        "Weight": rng.integers(140, 330, n),
+        "Cushioning": rng.choice(["AVG", "MAX", "MIN"], n, p=[0.5, 0.35, 0.15]),
+        "Drop": rng.choice(SYNTH_DROPS, n),
+        "Carbon Plate": np.where(race & (rng.random(n) < 0.6), "VAR", "YOK"),
+        "Pronation": np.where(over, "ICE BASMA", "NOTR"),
+        "Activity": activity,
+        5: rng.choice(["Kisa Mesafe", "Orta Mesafe", "Uzun Mesafe"], n),
+        4: rng.choice(["Kisa Omurlu", "Orta Omurlu", "Uzun Omurlu"], n),
+        1: np.where(men, "Erkek", "Kadin"),
+        2: np.where(road, "Road", "Trail"),
+        3: np.where(race, "Yaris", "Antrenman"),
+        7: np.where(over, "Evet", "Hayir"),
+        6: np.where(rng.random(n) < 0.4, "Evet", "Hayir"),
+    })
+
+def write_synthetic_xlsx(df: pd.DataFrame, path):
+    """openpyxl write-only: pandas.to_excel'den çok daha hızlı; üretim süresi ölçüme dahil değil."""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append([str(c) for c in df.columns])
+    for row in df.itertuples(index=False):
+        ws.append(list(row))
+    tmp = f"{path}.tmp"
+    wb.save(tmp)
+    os.replace(tmp, path)
+
+def synthetic_workbook(n: int, workdir, seed: int = 0):
+    path = os.path.join(workdir, f"synthetic_v{SYNTH_VERSION}_{n}_{seed}.xlsx")
+    if not os.path.exists(path):
+        write_synthetic_xlsx(synthetic_catalog(n, seed), path)
+    return path
+
+# -----------------------------
+# Suite
+# -----------------------------
+COMBINATIONS = [dict(zip(h.ANSWER_OPTIONS, combo)) for combo in itertools.product(*h.ANSWER_OPTIONS.values())]
+
+# model names, a typo, brand + model, SKU prefix / full SKU (synthetic codes are hex)
+SEARCH_QUERIES = ["vaporfly", "vapofly", "gel nimbus 7", "hoka speedgoat 3", "nike", "0012", "000A3F.005"]
+
+# drop <= 6 mm, an 8-10 mm band under 250 g, a price ceiling; each on top of every answer combination
+RANGE_SAMPLES = [{"drop": (None, 6.0)}, {"drop": (8.0, 10.0), "weight": (None, 250.0)}, {"price": (None, 5000.0)}]
+RANGE_COMBINATIONS = [{**params, **ranges} for params in COMBINATIONS for ranges in RANGE_SAMPLES]
+
+def per_query(fn, combos=COMBINATIONS) -> dict:
+    lat = []
+    for params in combos:
+        t0 = time.perf_counter()
+        fn(params)
+        lat.append(time.perf_counter() - t0)
+    lat = np.array(lat) * 1000
+    return {"seconds": round(float(lat.sum()) / 1000, 6), "queries": len(lat),
+            "mean_ms": round(float(lat.mean()), 4), "p50_ms": round(float(np.percentile(lat, 50)), 4),
+            "p95_ms": round(float(np.percentile(lat, 95)), 4), "max_ms": round(float(lat.max()), 4)}
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, timeout=30,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or None,
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def bench_suite(sizes, load_max: int, repeat: int, workdir) -> list:
+    results = []
+
+    def record(rows, stage, seconds=None, **extra):
+        entry = {"rows": rows, "stage": stage, **({"seconds": round(seconds, 6)} if seconds is not None else {}), **extra}
+        results.append(entry)
+        shown = f"{entry['seconds']*1000:10.2f} ms" if "seconds" in entry else ""
+        if "p50_ms" in extra:
+            shown += f"  (p50 {extra['p50_ms']:.3f} / p95 {extra['p95_ms']:.3f} ms per query)"
+        print(f"rows={rows:>8}  {stage:<22}{shown}", flush=True)
+
+    for n in sizes:
+        if n <= load_max:
+            path = synthetic_workbook(n, workdir)
+            record(n, "load/xlsx", timeit(lambda: h.read_data_sheet(path), max(1, repeat // 2)))
+            snap = h.compile_snapshot(path, force=True)
+            digest = h.workbook_digest(path)
+            record(n, "load/snapshot", timeit(lambda: h.read_snapshot(snap, digest), repeat))
+            os.remove(snap)
+            df, _ = h.read_data_sheet(path)
+        else:
+            df = synthetic_catalog(n)
+        df = h.prepare_raw(df)  # the categorical layout the apps build on, at every size
+        record(n, "normalize", timeit(lambda: h.build_normalized_view(df), repeat))
+        dfn = h.build_normalized_view(df)
+        record(n, "index/bitmap", timeit(lambda: h.FilterIndex(dfn), repeat))
+        index = h.FilterIndex(dfn)
+        record(n, "index/answers", timeit(lambda: h.AnswerTable(index), max(1, repeat // 2)))
+        answers = h.AnswerTable(index)
+        record(n, "filter/masks", **per_query(lambda p: h.apply_filters(dfn, p)))
+        record(n, "filter/bitmap", **per_query(lambda p: h.apply_filters(dfn, p, index=index)))
+        record(n, "filter/answers", **per_query(lambda p: h.apply_filters(dfn, p, index=answers)))
+        record(n, "index/ranges", timeit(lambda: h.SpecIndex(dfn), repeat))
+        specs = h.SpecIndex(dfn)
+        record(n, "filter/range_masks", **per_query(lambda p: h.filter_positions(dfn, p, index=answers), RANGE_COMBINATIONS))
+        record(n, "filter/ranges", **per_query(lambda p: h.filter_positions(dfn, p, index=answers, ranges=specs),
+                                               RANGE_COMBINATIONS))
+        search_cols = ["Brand", "ModelName", "Family", "Model", "MR"]
+        record(n, "index/search", timeit(lambda: h.SearchIndex(df, search_cols), max(1, repeat // 2)))
+        search = h.SearchIndex(df, search_cols)
+        record(n, "search", **per_query(lambda q: search.search(q, 50), SEARCH_QUERIES))
+        similar_args = (list(h.SIMILAR_NUMERIC),
+                        ["Cushioning", "Carbon Plate", "Pronation", "Activity", "q5_group"])
+        record(n, "index/similar", timeit(lambda: h.SimilarityIndex(dfn, *similar_args, group="Model", gender="q1"), repeat))
+        similar = h.SimilarityIndex(dfn, *similar_args, group="Model", gender="q1")
+        sample = np.linspace(0, n - 1, 32).astype(int)
+        record(n, "similar", **per_query(lambda p: similar.query([p], 10), sample))
+        cols = h.resolve_output_columns(df)
+        largest = max(COMBINATIONS, key=answers.count)
+        hit = h.apply_filters(dfn, largest, index=answers)
+        record(n, "export/csv_result", timeit(lambda: h.to_csv_bytes(hit, cols), repeat), result_rows=len(hit))
+        record(n, "export/csv_catalog", timeit(lambda: h.to_csv_bytes(dfn, cols), max(1, repeat // 2)))
+    return results
+
+def write_results(results: list, out: str):
+    payload = {
+        **git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "synthetic_version": SYNTH_VERSION,
+        "results": results,
+    }
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=1)
+    print(f"-> {out}")
+
+def compare_results(old_path: str, new_path: str, threshold: float) -> int:
+    """Aşama başına yeni/eski süre oranı; threshold'u aşan (yavaşlayan) aşama sayısını döner."""
+    with open(old_path, encoding="utf-8") as fh:
+        old = json.load(fh)
+    with open(new_path, encoding="utf-8") as fh:
+        new = json.load(fh)
+    before = {(r["rows"], r["stage"]): r["seconds"] for r in old["results"]}
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    regressions = 0
+    for r in new["results"]:
+        prev = before.get((r["rows"], r["stage"]))
+        if not prev:
+            continue
+        ratio = r["seconds"] / prev
+        flag = "REGRESSION" if ratio > threshold else ("faster" if ratio < 1 / threshold else "")
+        regressions += ratio > threshold
+        print(f"rows={r['rows']:>8}  {r['stage']:<22}{prev*1000:10.2f} -> {r['seconds']*1000:10.2f} ms  x{ratio:5.2f}  {flag}")
+    return regressions
+
+# -----------------------------
+# Correctness checks: fast paths against the reference / brute force
+# -----------------------------
+def check_xlsx_reader(xlsx: str, workdir: str) -> str:
+    """Hafif okuyucu == pd.read_excel: gerçek workbook, sentetik katalog, tarih biçimleri ve 1904 takvimi."""
+    import datetime as dt
+    import io
+    import openpyxl
+    books = [synthetic_workbook(2000, workdir)] + ([xlsx] if os.path.exists(xlsx) else [])
+    for date1904 in (False, True):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Data"
+        if date1904:
+            wb.epoch = openpyxl.utils.datetime.CALENDAR_MAC_1904
+        ws.append(["Brand", "Launch", "Time", "Duration", "Custom", "Price", "Note"])
+        for i in range(5):
+            ws.append(["NIKE", dt.datetime(2024, 1, 2 + i, 10, 30), dt.time(8, i), dt.timedelta(hours=30 + i),
+                       dt.date(2023, 5, 1 + i), 1999.5 + i, f"a\nb {i}"])
+        for row in ws.iter_rows(min_row=2):
+            row[2].number_format, row[3].number_format = "hh:mm", "[h]:mm:ss"
+            row[4].number_format, row[5].number_format = 'dd"."mm"."yyyy', '#,##0.00 "TL"'
+        buf = io.BytesIO()
+        wb.save(buf)
+        books.append(buf)
+    for book in books:
+        if hasattr(book, "seek"):
+            book.seek(0)
+        lean, name = h.read_xlsx_sheet(book)
+        if hasattr(book, "seek"):
+            book.seek(0)
+        pd.testing.assert_frame_equal(lean, pd.read_excel(book, sheet_name=name))
+    for raw, want in [("a_x000D_b", "a\rb"), ("_x005F_x000D_", "_x000D_"), ("x005F_kalsin", "x005F_kalsin")]:
+        assert h.unescape_ooxml(raw) == want, (raw, h.unescape_ooxml(raw))
+    return f"{len(books)} workbooks"
+
+def check_filters_and_scoring(xlsx: str, workdir: str) -> str:
+    """
+    Maskeler == FilterIndex == AnswerTable (128 tam, tüm kısmi kombinasyonların sayıları);
+    Scorer.top_k == tüm satırları puanlayıp (skor azalan, katalog sırası) sıralayan kaba kuvvet.
+    """
+    dfn = h.build_normalized_view(synthetic_catalog(5000, seed=3))
+    index = h.FilterIndex(dfn)
+    answers = h.AnswerTable(index)
+    scorer = h.Scorer(index)
+    masks = {key: h.predicate_mask(dfn, key) for key in h.PREDICATES}
+    for params in COMBINATIONS:
+        want = h.filter_positions(dfn, params)
+        assert np.array_equal(index.positions(params), want), params
+        assert np.array_equal(answers.positions(params), want), params
+    partial = [dict(zip(h.ANSWER_OPTIONS, combo)) for combo in
+               itertools.product(*[[None, *opts] for opts in h.ANSWER_OPTIONS.values()])]
+    for params in partial:
+        mask = np.ones(len(dfn), dtype=bool)
+        for name, value in params.items():
+            key = None if value is None else h.ANSWER_OPTIONS[name][value]
+            if key is not None:
+                mask &= masks[key]
+        assert answers.count(params) == mask.sum(), params
+    for params in partial[::7]:
+        hard = np.ones(len(dfn), dtype=bool)
+        for name in h.HARD_PARAMS:
+            key = h.ANSWER_OPTIONS[name].get(params[name])
+            if key is not None:
+                hard &= masks[key]
+        score = sum(h.SCORE_WEIGHTS[key] * masks[key].astype(int) for key in scorer.soft_keys(params))
+        score = np.broadcast_to(score, len(dfn))
+        rows = np.flatnonzero(hard)
+        want = rows[np.lexsort((rows, -score[rows]))][:20]
+        pos, scores, _ = scorer.top_k(params, 20)
+        assert np.array_equal(pos, want), params
+        assert np.array_equal(scores, score[want]), params
+    return f"{len(COMBINATIONS)} full / {len(partial)} partial combinations"
+
+def _plain(frame: pd.DataFrame) -> pd.DataFrame:
+    # categories differ after a splice (union) vs a rebuild (observed only); compare the values
+    return frame.astype({c: object for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)})
+
+def check_catalog(frame: pd.DataFrame, name: str) -> h.Catalog:
+    """Kontroller için katalog: uygulamalardaki gibi _build_catalog (prepare_raw, normalize, FilterIndex)."""
+    return h._build_catalog(f"check:{name}", lambda: (frame, None, None), h.load_rules())
+
+def check_delta(xlsx: str, workdir: str) -> str:
+    """apply_delta == tam yeniden kurulum: satır sırası, normalize sütunlar, bitset'ler, 128 kombinasyon."""
+    df = synthetic_catalog(3000, seed=5)
+    # duplicate SKUs: the first copy is updated
+    base = check_catalog(pd.concat([df, df.iloc[[10, 20]]], ignore_index=True), "delta")
+    raw, dfn = base.raw, base.norm
+    base.ensure_answers()
+    sku = "MR"
+    changed = raw.iloc[[10, 500, 2999]].copy()
+    changed[1] = ["Kadin", "Erkek", "Kadin"]
+    changed["Drop"] = ["3 MM", "11 MM", "8,5 MM"]
+    changed["Cushioning"] = "ULTRA"  # a new category
+    added = raw.iloc[[0, 1]].copy()
+    added[sku] = ["NEW.001", "NEW.002"]
+    deletes = [str(raw[sku].iloc[20]), str(raw[sku].iloc[7]), "MISSING.000"]
+    nxt = h.apply_delta(base, pd.concat([changed, added]), deletes)
+
+    # expected: replace the first copy in place, drop other copies and deletes, append new SKUs
+    rows, seen = [], set()
+    upsert = {str(r[sku]): r for _, r in pd.concat([changed, added]).iterrows()}
+    for i in range(len(raw)):
+        key = str(raw[sku].iloc[i])
+        if key in deletes or (key in upsert and key in seen):
+            continue
+        seen.add(key)
+        rows.append(upsert[key] if key in upsert else raw.iloc[i])
+    rows += [r for k, r in upsert.items() if k not in set(raw[sku].astype(str))]
+    want_raw = pd.DataFrame([r.astype(object) for r in rows]).reset_index(drop=True).infer_objects()
+    want_norm = h.build_normalized_view(want_raw)
+    want_index = h.FilterIndex(want_norm)
+
+    pd.testing.assert_frame_equal(_plain(nxt.raw), _plain(want_raw), check_dtype=False)
+    pd.testing.assert_frame_equal(_plain(nxt.norm), _plain(want_norm), check_dtype=False)
+    for key, bits in want_index.bits.items():
+        assert np.array_equal(nxt.index.bits[key], bits), key
+    for params in COMBINATIONS:
+        want = h.filter_positions(want_norm, params)
+        assert np.array_equal(nxt.positions(params), want), params
+    plain_dtypes = {c: t for c, t in raw.dtypes.items() if not isinstance(t, pd.CategoricalDtype)}
+    assert nxt.raw.dtypes[list(plain_dtypes)].to_dict() == plain_dtypes, "dtypes changed"
+
+    # partial upserts keep the untouched fields; values are cast to the catalog's dtypes
+    target = str(raw[sku].iloc[500])
+    for partial in (pd.DataFrame({sku: [target], "Price": ["1999"]}), [{sku: target, "Price": 1999}]):
+        part = h.apply_delta(base, partial)
+        row = part.raw.index[part.raw[sku].astype(str) == target][0]
+        want = _plain(raw).iloc[500].copy()
+        want["Price"] = 1999
+        pd.testing.assert_series_equal(_plain(part.raw).iloc[row], want, check_names=False)
+        assert part.raw.dtypes[list(plain_dtypes)].to_dict() == plain_dtypes, "dtypes changed"
+        assert part.norm["price_tl"].iloc[row] == 1999 and part.norm["q1"].iloc[row] == dfn["q1"].iloc[500]
+    for bad in ([{sku: target, "Price": "abc"}], [{sku: "NEW.003", "Price": 5}], [{sku: target, "Weight": 1.5}],
+                [{"Price": 5}], [{sku: target, "Nope": 1}]):
+        try:
+            h.apply_delta(base, bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {bad}")
+    try:
+        h.apply_delta(base, [{sku: target}], [target])
+        raise AssertionError("accepted a SKU both upserted and deleted")
+    except ValueError:
+        pass
+    assert base.raw is raw and len(base.norm) == len(raw), "base catalog was modified"
+    return f"{len(raw)} -> {len(nxt.raw)} rows"
+
+def _search_reference(row_tokens: list, words: list):
+    """Her satırın her token'ı tek tek puanlanır (tam / önek / trigram Dice); SearchIndex.search ile aynı sıra."""
+    def word_score(word, token):
+        if token == word:
+            return 1.0
+        if token.startswith(word):
+            return 0.5 + 0.4 * len(word) / len(token)
+        if word.isalpha() and len(word) >= 3 and token.isalpha() and len(token) >= 3:
+            grams = h.trigrams(word)
+            dice = 2 * len(set(grams) & set(h.trigrams(token))) / (len(token) + len(grams))
+            if dice >= h.FUZZY_MIN_DICE:
+                return 0.8 * dice
+        return 0.0
+    ranked = []
+    for pos, tokens in enumerate(row_tokens):
+        best = [max((word_score(w, t) for t in tokens), default=0.0) for w in words]
+        hits = sum(b > 0 for b in best)
+        if hits:
+            total = sum(best)
+            ranked.append((-hits, -round(total * 1000), pos, total))
+    ranked.sort()
+    return [r[2] for r in ranked], [r[3] for r in ranked], [-r[0] for r in ranked]
+
+def check_search(xlsx: str, workdir: str) -> str:
+    """SearchIndex.search == tüm satırların token'larını tek tek puanlayan kaba kuvvet (tam / önek / yazım hatası)."""
+    cat = check_catalog(synthetic_catalog(3000, seed=7), "search")
+    raw = cat.raw
+    index = cat.ensure_search()
+    cols = [h.excel_letter_to_name(raw.columns, letter) for letter in h.SEARCH_LETTERS]
+    row_tokens = [set(t for v in row if pd.notna(v) for t in h.search_tokens(v))
+                  for row in raw[cols].itertuples(index=False)]
+    rng = np.random.default_rng(7)
+    vocab = list(index.vocab)
+    queries = list(SEARCH_QUERIES) + ["", "zzzz", "ultraboost vaporfly"]
+    for token in rng.choice(vocab, 40):
+        cut = max(1, len(token) - 1 - int(rng.integers(0, 3)))
+        typo = token[:cut // 2] + token[cut // 2 + 1:] if len(token) > 3 else token
+        queries += [token, token[:cut], typo, f"{token} {rng.choice(vocab)}"]
+    for query in queries:
+        want_pos, want_scores, want_hits = _search_reference(row_tokens, list(dict.fromkeys(h.search_tokens(query))))
+        for k in (1, 10, 50):
+            pos, scores, hits = index.search(query, k)
+            assert np.array_equal(pos, want_pos[:k]), (query, k)
+            assert np.allclose(scores, want_scores[:k]) and np.array_equal(hits, want_hits[:k]), (query, k)
+    return f"{len(queries)} queries x 3 k"
+
+def check_similar(xlsx: str, workdir: str) -> str:
+    """
+    SimilarityIndex.query == float64 özellik matrisinden tüm satırlara uzaklık (aynı model / farklı cinsiyet hariç).
+    float32 yuvarlamasıyla yer değiştirebilecek eşit uzaklıklar yüzünden komşular uzaklıkla karşılaştırılır.
+    """
+    cat = check_catalog(synthetic_catalog(4000, seed=11), "similar")
+    raw, dfn = cat.raw, cat.norm
+    index = cat.ensure_similarity()
+    blocks = []
+    for c in h.SIMILAR_NUMERIC:
+        x = dfn[c].to_numpy(dtype=float)
+        blocks.append(np.nan_to_num((x - np.nanmean(x)) / (np.nanstd(x) or 1.0))[:, None])
+    for letter in h.SIMILAR_CATEGORICAL:
+        c = letter if letter in dfn.columns else h.excel_letter_to_name(raw.columns, letter)
+        values = dfn[c].astype(object)
+        blocks.append(np.stack([(values == v).to_numpy() for v in values.dropna().unique()], axis=1) * np.sqrt(0.5))
+    features = np.hstack(blocks)
+    model = dfn[h.excel_letter_to_name(raw.columns, h.SIMILAR_GROUP_LETTER)].astype(str).to_numpy()
+    gender = dfn["q1"].astype(str).to_numpy()
+    queries = np.random.default_rng(11).choice(len(dfn), 300, replace=False)
+    k = 10
+    pos, dist = index.query(queries, k)
+    for q, got_pos, got_dist in zip(queries, pos, dist):
+        d = np.sqrt(((features - features[q]) ** 2).sum(axis=1))
+        d[(model == model[q]) | (gender != gender[q])] = np.inf
+        want = np.sort(d)[:k]
+        found = got_pos >= 0
+        assert found.sum() == np.isfinite(want).sum(), q
+        assert np.allclose(got_dist[found], want[np.isfinite(want)], atol=1e-3), q
+        assert np.allclose(d[got_pos[found]], got_dist[found], atol=1e-3), q  # each neighbour really at that distance
+        assert len(set(got_pos[found])) == found.sum(), q
+    table = cat.similar_table(k=3, positions=queries[:50])
+    assert len(table) == int((pos[:50, :3] >= 0).sum()), "similar_table"
+    return f"{len(queries)} queries, k={k}"
+
+def check_snapshot(xlsx: str, workdir: str) -> str:
+    """Snapshot'sız okuma == snapshot'ı yazan ilk okuma == snapshot'tan okuma (karışık tipli sütun, tarih başlık)."""
+    import datetime as dt
+    import openpyxl
+    df = synthetic_catalog(500, seed=13)
+    path = os.path.join(workdir, "check_snapshot.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append([*map(str, df.columns), dt.datetime(2025, 1, 1)])
+    for i, row in enumerate(df.itertuples(index=False)):
+        row = list(row)
+        row[4] = 1080 if i % 5 == 0 else row[4]  # Family: str + int
+        ws.append(row + [i % 3 or "x"])
+    wb.save(path)
+    h.snapshot_path(path).unlink(missing_ok=True)
+    rules = h.load_rules()
+    plain = h._build_catalog("check:plain", lambda: (*h.read_data_sheet(path), None), rules)
+    cold = h.read_workbook_cached(path, rules)
+    assert h.snapshot_path(path).exists(), "snapshot not written"
+    reads, opens = h.LOAD_STATS["snapshot_reads"], h.LOAD_STATS["workbook_opens"]
+    warm = h.read_workbook_cached(path, rules)
+    assert h.LOAD_STATS["snapshot_reads"] == reads + 1, "snapshot not read"
+    assert h.LOAD_STATS["workbook_opens"] == opens, "workbook opened despite a current snapshot"
+    for raw, sheet, dfn in (cold, warm):
+        pd.testing.assert_frame_equal(raw, plain.raw)
+        pd.testing.assert_frame_equal(dfn, plain.norm)
+    return f"{len(plain.raw.columns)} columns, labels {plain.raw.columns[-1]!r}"
+
+SPEC_CASES = [("6,5 MM", 6.5), ("10 MM", 10.0), (264, 264.0), (1999.5, 1999.5), ("1.234,5 TL", 1234.5),
+              ("13.999 TL", 13999.0), ("1,234.5", 1234.5), ("0.250", 0.25), ("264 G (US 9)", 264.0),
+              ("8-10 MM", np.nan), ("8 – 10 MM", np.nan), ("8/10", np.nan), ("YOK", np.nan), (None, np.nan)]
+
+def check_spec_number(xlsx: str, workdir: str) -> str:
+    """spec_number: Türkçe ondalık / binlik ayırıcıları, birimler, aralıklar; kategorik kaynakta aynı sonuç."""
+    values = pd.Series([v for v, _ in SPEC_CASES], dtype=object)
+    want = np.array([w for _, w in SPEC_CASES], dtype=float)
+    got = h.spec_number(values)
+    assert np.array_equal(got, want, equal_nan=True), list(zip(values, got))
+    text = values.where(values.isna(), values.astype(str))
+    assert np.array_equal(h.spec_number(text.astype("category")), h.spec_number(text), equal_nan=True), "categorical"
+    return f"{len(SPEC_CASES)} cases"
+
+CHECKS = {
+    "xlsx_reader": check_xlsx_reader,
+    "filters_scoring": check_filters_and_scoring,
+    "delta": check_delta,
+    "search": check_search,
+    "similar": check_similar,
+    "spec_number": check_spec_number,
+    "snapshot": check_snapshot,
+}
+
+def run_checks(xlsx: str, workdir: str) -> int:
+    """Her kontrolü çalıştırır; başarısız olan sayısını döner."""
+    failed = 0
+    for name, check in CHECKS.items():
+        t0 = time.perf_counter()
+        try:
+            detail = check(xlsx, workdir)
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL {name}: {e}", flush=True)
+            continue
+        print(f"ok   {name:<16} {time.perf_counter() - t0:6.2f} s  {detail}", flush=True)
+    return failed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("bench", choices=["normalize", "fetch", "memory", "clicks", "suite", "compare", "check"])
+    ap.add_argument("files", nargs="*", help="compare: eski.json yeni.json")
+    ap.add_argument("--xlsx", default=DEFAULT_XLSX)
+    ap.add_argument("--scale", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--sizes", default="1000,10000,100000,1000000")
+    ap.add_argument("--load-max", type=int, default=100_000, help="bu boyuta kadar xlsx/snapshot yükleme de ölçülür")
+    ap.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "grlsz_bench"), help="sentetik workbook önbelleği")
+    ap.add_argument("--out", help="suite JSON çıktısı (varsayılan bench_suite_<commit>.json)")
+    ap.add_argument("--threshold", type=float, default=1.15)
+    ap.add_argument("--app", default="running_shoes_app_grlsz_wizard.py")
+    ap.add_argument("--clicks", type=int, default=24)
+    ap.add_argument("--port", type=int, default=8611)
+    args = ap.parse_args()
+
+    if args.bench == "fetch":
+        bench_fetch(args.xlsx)
+        return
+    if args.bench == "clicks":
+        print(json.dumps(bench_clicks(args.app, args.clicks, args.port)))
+        return
+    if args.bench == "suite":
+        os.makedirs(args.workdir, exist_ok=True)
+        results = bench_suite([int(x) for x in args.sizes.split(",")], args.load_max, args.repeat, args.workdir)
+        write_results(results, args.out or f"bench_suite_{git_revision()['commit'] or 'local'}.json")
+        return
+    if args.bench == "check":
+        os.makedirs(args.workdir, exist_ok=True)
+        sys.exit(1 if run_checks(args.xlsx, args.workdir) else 0)
+    if args.bench == "compare":
+        if len(args.files) != 2:
+            ap.error("compare needs two result files")
+        sys.exit(1 if compare_results(*args.files, args.threshold) else 0)
+    df, _ = h.read_data_sheet(args.xlsx)
+    if args.bench == "memory":
+        bench_memory(df)
+        return
+    if args.bench == "normalize":
+        bench_normalize(df, "workbook", args.repeat)
+        big = pd.concat([df] * args.scale, ignore_index=True)
+        bench_normalize(big, f"x{args.scale}", max(1, args.repeat // 2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Workbook -> Feather snapshot (Data/DATA sayfası + q1..q7 normalize sütunları).
+
+    python compile_grlsz.py ["Kod _n_ son grlsz.xlsx" ...] [--force]
+
+Snapshot workbook'un yanına yazılır (aynı ad, .feather). Uygulama açılırken
+workbook'un içeriği değişmediyse Excel yerine snapshot okunur.
+"""
+import argparse, time
+import helpers_grlsz as h
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("workbooks", nargs="*", default=["Kod _n_ son grlsz.xlsx"])
+    ap.add_argument("--force", action="store_true", help="snapshot güncel olsa da yeniden üret")
+    args = ap.parse_args()
+    for wb in args.workbooks:
+        t0 = time.perf_counter()
+        out = h.compile_snapshot(wb, force=args.force)
+        print(f"{wb} -> {out} ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from pathlib import Path
-import unicodedata, re, io
+from dataclasses import dataclass, field
+from collections import Counter, OrderedDict
+import unicodedata, re, io, os, json, hashlib, tempfile, threading, time, zipfile, bisect, logging
+from contextlib import contextmanager
+import xml.etree.ElementTree as ET
+
+log = logging.getLogger("grlsz")
 
 # -----------------------------
 # Text utils
@@ -12,7 +19,10 @@ def strip_accents(s: str) -> str:
     return ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
 
 def norm_token(s: str) -> str:
-    s = strip_accents(str(s)).lower().strip()
+    s = str(s)
+    if not s.isascii():  # ASCII has nothing to decompose
+        s = strip_accents(s)
+    s = s.lower().strip()
     s = re.sub(r"\s+", " ", s)
     return s
 
@@ -26,73 +36,225 @@ def pick(df: pd.DataFrame, key):
         return df[str(key)]
     return pd.Series([None]*len(df), index=df.index)
 
-def build_normalized_view(df: pd.DataFrame) -> pd.DataFrame:
-    dfn = df.copy()
-    c1 = pick(dfn, 1).astype(str)
-    c2 = pick(dfn, 2).astype(str)
-    c3 = pick(dfn, 3).astype(str)
-    c4 = pick(dfn, 4).astype(str)
-    c5 = pick(dfn, 5).astype(str)
-    c6 = pick(dfn, 6)
-    c7 = pick(dfn, 7).astype(str)
-
-    # Q1: Gender
-    dfn["q1"] = c1.map(lambda x: "erkek" if "erkek" in norm_token(x) or "male" in norm_token(x) else ("kadin" if "kadin" in norm_token(x) or "female" in norm_token(x) else None))
-
-    # Q2: Surface
-    def map_surface(x):
-        t = norm_token(x)
-        if "yol" in t or "road" in t:
-            return "road"
-        if "patika" in t or "trail" in t:
-            return "trail"
-        return None
-    dfn["q2"] = c2.map(map_surface)
-
-    # Q3: Goal
-    def map_goal(x):
-        t = norm_token(x)
-        if "yaris" in t or "race" in t:
-            return "yaris"
-        if "antrenman" in t or "training" in t:
-            return "antrenman"
-        return None
-    dfn["q3"] = c3.map(map_goal)
-
-    # Q4: Durability long
-    def map_durability_long(x):
-        t = norm_token(x)
-        return ("uzun" in t) and ("omurlu" in t or "omur" in t)
-    dfn["q4_is_long"] = c4.map(map_durability_long)
-
-    # Q5: Distance group
-    def map_distance_group(x):
-        t = norm_token(x)
-        if ("orta" in t and "mesafe" in t) or ("medium" in t):
-            return "orta mesafe"
-        if ("uzun" in t and "mesafe" in t) or ("long" in t):
-            return "uzun mesafe"
-        if ("kisa" in t and "mesafe" in t) or ("short" in t):
-            return "kisa mesafe"
-        return None
-    dfn["q5_group"] = c5.map(map_distance_group)
+# compact dtypes: labels as categoricals (int8 codes), flags as numpy bool
+NORMALIZED_DTYPES = {
+    "q1": "category",
+    "q2": "category",
+    "q3": "category",
+    "q4_is_long": bool,
+    "q5_group": "category",
+    "q6_injury_ok": bool,
+    "q7_pronation_yes": bool,
+}
+Q_COLUMNS = list(NORMALIZED_DTYPES)
+# typed spec columns, parsed once at load: name -> (column letter, zero means missing)
+SPEC_COLUMNS = {
+    "drop_mm": ("M", False),
+    "price_tl": ("J", True),
+    "weight_g": ("K", True),
+}
+DERIVED_COLUMNS = Q_COLUMNS + list(SPEC_COLUMNS)  # added to the raw columns by build_normalized_view
+
+# -----------------------------
+# Q1..Q7 token rules (rules_grlsz.json), compiled once per config hash
+# -----------------------------
+RULES_PATH = Path(__file__).with_name("rules_grlsz.json")
+
+@dataclass
+class QuestionRule:
+    """
+    Bir q sütununun kuralları: her kural bir adlandırılmış grup (r0, r1, ...) olarak tek regex'te.
+    İlk eşleşen kural kazanır; hiçbiri eşleşmezse default.
+    """
+    out: str
+    source: object
+    pattern: re.Pattern
+    values: list
+    default: object = None
+    number: dict = None  # {"equals": 1.2, "value": true}: sayıya çevrilebilen değerleri yalnızca bu karar verir
 
-    # Q6: Injury ok
-    def map_injury_ok(x):
+    def apply(self, uniques: pd.Series) -> np.ndarray:
+        """Yalnızca farklı değerler üzerinde eşler (object dizi); satırlara map() kodlarla yayar."""
+        choices = self.values + [self.default]
+        matches = (self.pattern.match(norm_token(str(u))) for u in uniques)
+        # lastgroup "r<i>" names the first rule that matched
+        out = np.array([choices[int(m.lastgroup[1:])] if m else self.default for m in matches], dtype=object)
+        if self.number is not None:
+            num = pd.to_numeric(uniques, errors="coerce").to_numpy(dtype=float)
+            is_num = ~np.isnan(num)
+            out[is_num] = np.where(np.abs(num[is_num] - self.number["equals"]) < 1e-6, self.number["value"], self.default)
+        return out
+
+    def map(self, s: pd.Series) -> pd.Series:
+        codes, uniques = unique_codes(s)
+        out = self.apply(uniques)
+        if NORMALIZED_DTYPES[self.out] is bool:
+            return pd.Series(out.astype(bool)[codes], index=s.index)
+        labels, cats = pd.factorize(out, sort=True)  # None -> -1 (missing)
+        return pd.Series(pd.Categorical.from_codes(labels[codes], cats.astype(object)), index=s.index)
+
+@dataclass
+class RuleSet:
+    digest: str
+    questions: list  # QuestionRule, in Q_COLUMNS order
+
+def _rule_regex(rule: dict) -> str:
+    terms = {kind: [re.escape(norm_token(t)) for t in rule.get(kind, ())] for kind in ("any", "all", "exact")}
+    if sum(bool(v) for v in terms.values()) != 1:
+        raise ValueError(f"rule {rule!r} needs exactly one of 'any', 'all', 'exact'")
+    if terms["any"]:
+        return "(?=.*?(?:" + "|".join(terms["any"]) + "))"
+    if terms["all"]:
+        return "".join(f"(?=.*?{t})" for t in terms["all"])
+    return "(?:" + "|".join(terms["exact"]) + r")\Z"
+
+def compile_rules(config: dict, digest: str) -> RuleSet:
+    """JSON kural tanımı -> soru başına tek regex (kural başına bir adlandırılmış grup)."""
+    if set(config) != set(Q_COLUMNS):
+        raise ValueError(f"rules must define exactly {', '.join(Q_COLUMNS)}")
+    questions = []
+    for out in Q_COLUMNS:
+        q = config[out]
+        flag = NORMALIZED_DTYPES[out] is bool
+        if not q.get("rules"):
+            raise ValueError(f"{out}: no rules")
+        values = [r["value"] for r in q["rules"]]
+        if flag and not all(isinstance(v, bool) for v in values + [q.get("default", False)]):
+            raise ValueError(f"{out}: values must be true/false")
+        alternatives = "|".join(f"(?P<r{i}>{_rule_regex(r)})" for i, r in enumerate(q["rules"]))
+        questions.append(QuestionRule(
+            out=out,
+            source=q["source"],
+            pattern=re.compile(f"^(?:{alternatives})", re.S),
+            values=values,
+            default=q.get("default", False if flag else None),
+            number=q.get("number"),
+        ))
+    return RuleSet(digest, questions)
+
+_RULES = {}  # config sha1 -> RuleSet, or the error message if that content does not compile
+_RULES_LOCK = threading.Lock()
+_LAST_GOOD = {}  # rules path -> last RuleSet that compiled from it
+_RULES_ERRORS = {}  # rules path -> why the file on disk is not in use
+
+def rules_path(path=None) -> Path:
+    return Path(path or os.environ.get("GRLSZ_RULES") or RULES_PATH)
+
+def load_rules(path=None) -> RuleSet:
+    """
+    Kural dosyasını her çağrıda okur (küçük); derlenmiş hali içerik hash'ine göre saklanır.
+    Dosya değişince yeni hash katalog anahtarına girer, uygulama yeniden başlatılmadan kataloglar yeniden kurulur.
+    Dosya okunamaz / derlenemezse son geçerli kurallarla devam edilir (hata: rules_error);
+    hiç geçerli kural yoksa ValueError.
+    """
+    path = rules_path(path)
+    key = str(path)
+    try:
+        data = path.read_bytes()
+    except OSError as e:
+        return _keep_last_good(key, f"{path.name}: {e}")
+    digest = hashlib.sha1(data).hexdigest()[:12]
+    rules = _RULES.get(digest)
+    if rules is None:
         try:
-            xv = float(x)
-            return abs(xv - 1.2) < 1e-6
-        except Exception:
-            t = norm_token(str(x))
-            return ("evet" in t) or ("uygun" in t) or ("yes" in t)
-    dfn["q6_injury_ok"] = c6.map(map_injury_ok)
+            rules = compile_rules(json.loads(data), digest)
+        except (ValueError, KeyError, TypeError, re.error) as e:
+            rules = f"{path.name}: {e}"
+        with _RULES_LOCK:
+            _RULES[digest] = rules
+    if isinstance(rules, str):
+        return _keep_last_good(key, rules)
+    _LAST_GOOD[key] = rules
+    _RULES_ERRORS.pop(key, None)
+    return rules
+
+def _keep_last_good(key: str, message: str) -> RuleSet:
+    last = _LAST_GOOD.get(key)
+    if last is None:
+        raise ValueError(message)
+    if _RULES_ERRORS.get(key) != message:  # log once per distinct error, not on every rerun
+        log.warning("%s; keeping rules %s", message, last.digest)
+    _RULES_ERRORS[key] = message
+    return last
+
+def rules_error(path=None):
+    """Diskteki kural dosyası kullanılamıyorsa hata mesajı (son geçerli kurallar kullanılıyor), değilse None."""
+    return _RULES_ERRORS.get(str(rules_path(path)))
 
-    # Q7: Pronation yes
-    def map_pronation_yes(x):
-        t = norm_token(x)
-        return ("evet" in t) or (t == "1") or ("yes" in t)
-    dfn["q7_pronation_yes"] = c7.map(map_pronation_yes)
+def unique_codes(s: pd.Series):
+    """(codes, uniques): her satırın farklı-değer kodu; kategorik kaynakta mevcut kodlar kullanılır."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # categorical source: reuse its codes; the extra last slot stands for missing values
+        uniques = s.cat.categories.astype(object).append(pd.Index([np.nan], dtype=object))
+        codes = np.where(s.cat.codes.to_numpy() < 0, len(uniques) - 1, s.cat.codes.to_numpy())
+    else:
+        codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    return codes, pd.Series(uniques, dtype=object)
+
+SPEC_NUMBER = re.compile(r"(?<![\d.,])-?\d[\d.,]*")
+SPEC_THOUSANDS = re.compile(r"-?[1-9]\d{0,2}(?:\.\d{3})+")  # "13.999", "1.234.567": dotted groups, no comma
+SPEC_RANGE = re.compile(r"\d\s*[-–~/]\s*-?\d")  # "8-10 MM", "8 – 10", "8/10"
+
+def _spec_float(value) -> float:
+    """Tek hücre: sayı aynen; metinde ilk sayı, aralıksa ('8-10 MM') NaN."""
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value)
+    found = SPEC_NUMBER.search(text)
+    if found is None or SPEC_RANGE.search(text):
+        return np.nan
+    token = found.group().rstrip(".,")
+    if "," in token:
+        # Turkish: comma decimal, dots group thousands ("1.234,5"); "1,234.5" if the dot comes last
+        token = token.replace(".", "").replace(",", ".") if token.rfind(",") > token.rfind(".") else token.replace(",", "")
+    elif SPEC_THOUSANDS.fullmatch(token):
+        token = token.replace(".", "")
+    try:
+        return float(token)
+    except ValueError:  # "1.2.3"
+        return np.nan
+
+def spec_number(s: pd.Series) -> np.ndarray:
+    """
+    '6,5 MM' / '10 MM' / '1.234,5 TL' / '13.999 TL' / 264 -> float64 (virgül ondalık, nokta binlik, birim atılır).
+    Sayı yoksa ya da aralıksa ('8-10 MM') NaN. Farklı değer başına bir kez.
+    """
+    codes, uniques = unique_codes(s)
+    values = np.fromiter((_spec_float(v) for v in uniques), dtype=float, count=len(uniques))
+    return values[codes]
+
+def spec_values(df: pd.DataFrame, letter: str, zero_missing: bool = False) -> np.ndarray:
+    """Harfle verilen spec sütunu -> float64 (sütun yoksa tümü NaN; zero_missing ise 0 / negatif de NaN)."""
+    try:
+        x = spec_number(df[excel_letter_to_name(df.columns, letter)])
+    except IndexError:
+        return np.full(len(df), np.nan)
+    if zero_missing:
+        x[x <= 0] = np.nan
+    return x
 
+def compact_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Tekrarlı metin sütunlarını (Brand, Category, Cushioning, ...) categorical'a çevirir; benzersiz olanlar (MR) kalır."""
+    df = df.copy(deep=False)
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(col.dtype):
+            continue
+        if pd.api.types.infer_dtype(col, skipna=True) == "string" and col.nunique() * 2 <= len(col):
+            df[c] = col.astype("category")
+    return df
+
+def build_normalized_view(df: pd.DataFrame, rules: RuleSet = None) -> pd.DataFrame:
+    """df'in sütunları + q1..q7 + sayısal spec'ler (drop_mm, ...); ham sütunlar kopyalanmaz, df ile paylaşılır (copy-on-write)."""
+    rules = rules or load_rules()
+    with timed_stage("normalize", rows_in=len(df)) as rec:
+        cols = {}
+        for q in rules.questions:
+            cols[q.out] = q.map(pick(df, q.source))
+        for out, (letter, zero_missing) in SPEC_COLUMNS.items():
+            cols[out] = spec_values(df, letter, zero_missing)
+        dfn = pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
+        rec["rows_out"] = len(dfn)
     return dfn
 
 # -----------------------------
@@ -122,7 +284,160 @@ def resolve_output_columns(df: pd.DataFrame):
 
 
 
-def apply_filters(df_norm: pd.DataFrame, params: dict) -> pd.DataFrame:
+# -----------------------------
+# Filter predicates & bitmap index
+# -----------------------------
+# predicate key -> boolean row mask over the normalized view
+PREDICATES = {
+    "q1=erkek": lambda f: f["q1"] == "erkek",
+    "q1=kadin": lambda f: f["q1"] == "kadin",
+    "q2=road": lambda f: f["q2"] == "road",
+    "q2=trail": lambda f: f["q2"] == "trail",
+    "q3=yaris": lambda f: f["q3"] == "yaris",
+    "q3=antrenman": lambda f: f["q3"] == "antrenman",
+    "q4_is_long": lambda f: f["q4_is_long"] == True,
+    "q5_orta_uzun": lambda f: f["q5_group"].isin(["orta mesafe", "uzun mesafe"]),
+    "q6_injury_ok": lambda f: f["q6_injury_ok"] == True,
+    "q7_pronation_yes": lambda f: f["q7_pronation_yes"] == True,
+}
+
+def predicate_keys(params: dict) -> list:
+    """Cevapları (params) apply_filters kurallarına göre predicate anahtarlarına çevirir."""
+    keys = [
+        "q1=erkek" if params["gender"] == "Erkek" else "q1=kadin",
+        "q2=road" if params["surface"] == "Road" else "q2=trail",
+        "q3=yaris" if params["goal"] == "Yaris" else "q3=antrenman",
+    ]
+    if params["freq"] == "4 ve daha fazla":
+        keys.append("q4_is_long")
+    if params["distance"] == "20 km ve daha fazla":
+        keys.append("q5_orta_uzun")
+    if params["injury"] == "Var":
+        keys.append("q6_injury_ok")
+    if params["pronation"] == "Evet":
+        keys.append("q7_pronation_yes")
+    return keys
+
+def predicate_mask(df_norm: pd.DataFrame, key: str) -> np.ndarray:
+    return PREDICATES[key](df_norm).to_numpy(dtype=bool, na_value=False)
+
+class FilterIndex:
+    """Her predicate için paketlenmiş bitset; katalog sürümü başına bir kez kurulur."""
+
+    def __init__(self, df_norm: pd.DataFrame):
+        self.n = len(df_norm)
+        self.bits = {key: np.packbits(predicate_mask(df_norm, key)) for key in PREDICATES}
+
+    @classmethod
+    def from_bits(cls, n: int, bits: dict) -> "FilterIndex":
+        index = cls.__new__(cls)
+        index.n, index.bits = n, bits
+        return index
+
+    def spliced(self, src: np.ndarray, delta_norm: pd.DataFrame) -> "FilterIndex":
+        """
+        Yeni index: src[i] >= 0 ise i. satır eski src[i]. satırdır, -1-j ise delta_norm'un j. satırı.
+        Yalnızca delta satırlarında predicate'ler yeniden hesaplanır.
+        """
+        from_old = src >= 0
+        bits = {}
+        for key, packed in self.bits.items():
+            mask = np.empty(len(src), dtype=bool)
+            mask[from_old] = np.unpackbits(packed, count=self.n).view(bool)[src[from_old]]
+            mask[~from_old] = predicate_mask(delta_norm, key)[-1 - src[~from_old]]
+            bits[key] = np.packbits(mask)
+        return FilterIndex.from_bits(len(src), bits)
+
+    def positions(self, params: dict) -> np.ndarray:
+        keys = predicate_keys(params)
+        acc = self.bits[keys[0]].copy()
+        for key in keys[1:]:
+            np.bitwise_and(acc, self.bits[key], out=acc)
+        return np.flatnonzero(np.unpackbits(acc, count=self.n))
+
+# param -> {answer option: predicate key (None = no constraint)}
+ANSWER_OPTIONS = {
+    "gender": {"Erkek": "q1=erkek", "Kadin": "q1=kadin"},
+    "surface": {"Road": "q2=road", "Trail": "q2=trail"},
+    "goal": {"Yaris": "q3=yaris", "Antrenman": "q3=antrenman"},
+    "freq": {"3 ve daha az": None, "4 ve daha fazla": "q4_is_long"},
+    "distance": {"0-20 km": None, "20 km ve daha fazla": "q5_orta_uzun"},
+    "injury": {"Var": "q6_injury_ok", "Yok": None},
+    "pronation": {"Evet": "q7_pronation_yes", "Hayir": None},
+}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+class AnswerTable:
+    """
+    Tüm cevap kombinasyonları önceden hesaplanır:
+    - 2^7 = 128 tam kombinasyonun sonuç satırları (tek int32 dizi + offset'ler)
+    - 3^7 kombinasyonun (cevaplanmamış soru = kısıt yok) sonuç sayıları
+    """
+
+    def __init__(self, index: FilterIndex):
+        self.n = index.n
+        self._digits = {name: {opt: i + 1 for i, opt in enumerate(opts)} for name, opts in ANSWER_OPTIONS.items()}
+        n_q = len(ANSWER_OPTIONS)
+        option_keys = [list(opts.values()) for opts in ANSWER_OPTIONS.values()]
+        self.counts = np.zeros(3 ** n_q, dtype=np.int64)
+        parts = {}
+
+        def walk(q, code, acc, full):
+            if q == n_q:
+                self.counts[code] = self.n if acc is None else _POPCOUNT[acc].sum()
+                if full:
+                    parts[code] = np.flatnonzero(np.unpackbits(acc, count=self.n)).astype(np.int32)
+                return
+            walk(q + 1, code * 3, acc, False)
+            for digit, key in enumerate(option_keys[q], start=1):
+                nxt = acc
+                if key is not None:
+                    bits = index.bits[key]
+                    nxt = bits if acc is None else np.bitwise_and(acc, bits)
+                walk(q + 1, code * 3 + digit, nxt, full)
+
+        walk(0, 0, None, True)
+        lengths = np.zeros(3 ** n_q, dtype=np.int64)
+        for code, rows in parts.items():
+            lengths[code] = len(rows)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.rows = np.concatenate([parts[c] for c in sorted(parts)])
+
+    def code(self, params: dict) -> int:
+        code = 0
+        for name, digits in self._digits.items():
+            value = params.get(name)
+            code = code * 3 + (0 if value is None else digits[value])
+        return code
+
+    def codes(self, frame: pd.DataFrame) -> np.ndarray:
+        """Satır başına cevap kodu (vektörel); eksik/geçersiz cevaplı satırlar -1."""
+        codes = np.zeros(len(frame), dtype=np.int64)
+        valid = np.ones(len(frame), dtype=bool)
+        for name, digits in self._digits.items():
+            if name not in frame.columns:
+                return np.full(len(frame), -1, dtype=np.int64)
+            d = frame[name].map(digits).to_numpy(dtype=float, na_value=np.nan)
+            valid &= ~np.isnan(d)
+            codes = codes * 3 + np.nan_to_num(d).astype(np.int64)
+        codes[~valid] = -1
+        return codes
+
+    def positions_for_code(self, code: int) -> np.ndarray:
+        return self.rows[self.offsets[code]:self.offsets[code + 1]]
+
+    def count(self, params: dict) -> int:
+        """Eksik/None cevaplar kısıt sayılmaz; kısmi cevaplarda da çalışır."""
+        return int(self.counts[self.code(params)])
+
+    def positions(self, params: dict) -> np.ndarray:
+        code = self.code(params)
+        if any(params.get(name) is None for name in ANSWER_OPTIONS):
+            raise ValueError("positions() needs an answer for all seven questions.")
+        return self.positions_for_code(code)
+
+def apply_filters(df_norm: pd.DataFrame, params: dict, index=None, ranges=None) -> pd.DataFrame:
     """
     Kurallar:
     - Q1: gender -> 'erkek' / 'kadin'
@@ -132,20 +447,376 @@ def apply_filters(df_norm: pd.DataFrame, params: dict) -> pd.DataFrame:
     - Q5: distance -> '20 km ve daha fazla' ise q5_group ∈ {'orta mesafe','uzun mesafe'}
     - Q6: injury -> 'Var' ise q6_injury_ok == True
     - Q7: pronation -> 'Evet' ise q7_pronation_yes == True
+
+    Opsiyonel aralıklar (RANGE_FILTERS): params["drop"] = (lo, hi), None = açık uç, sınırlar dahil;
+    değeri eksik satırlar aralığa girmez.
+
+    index verilirse (aynı df_norm için kurulmuş FilterIndex ya da AnswerTable)
+    sorgu bitset AND'leri / tablo araması ve tek bir take ile yapılır; ranges (SpecIndex) verilirse
+    aralıklar sıralı dizilerde ikili aramayla bulunur.
     """
-    f = df_norm.copy()
-    f = f[f["q1"] == ("erkek" if params["gender"] == "Erkek" else "kadin")]
-    f = f[f["q2"] == ("road" if params["surface"] == "Road" else "trail")]
-    f = f[f["q3"] == ("yaris" if params["goal"] == "Yaris" else "antrenman")]
-    if params["freq"] == "4 ve daha fazla":
-        f = f[f["q4_is_long"] == True]
-    if params["distance"] == "20 km ve daha fazla":
-        f = f[f["q5_group"].isin(["orta mesafe", "uzun mesafe"])]
-    if params["injury"] == "Var":
-        f = f[f["q6_injury_ok"] == True]
-    if params["pronation"] == "Evet":
-        f = f[f["q7_pronation_yes"] == True]
-    return f
+    return df_norm.take(filter_positions(df_norm, params, index, ranges))
+
+def filter_positions(df_norm: pd.DataFrame, params: dict, index=None, ranges=None) -> np.ndarray:
+    """apply_filters ile aynı kurallar; eşleşen satırların konumlarını (kopya yapmadan) döner."""
+    with timed_stage("filter", rows_in=len(df_norm)) as rec:
+        if index is not None:
+            positions = index.positions(params)
+        else:
+            keys = predicate_keys(params)
+            mask = predicate_mask(df_norm, keys[0])
+            for key in keys[1:]:
+                mask = mask & predicate_mask(df_norm, key)
+            positions = np.flatnonzero(mask)
+        active = range_params(params)
+        if active and ranges is not None:
+            positions = ranges.filter(positions, active)
+        elif active:
+            positions = positions[range_mask(df_norm, active)[positions]]
+        rec["rows_out"] = len(positions)
+    return positions
+
+# -----------------------------
+# Numeric range filters (typed spec columns, sorted per column)
+# -----------------------------
+# param -> typed spec column; value (lo, hi), None = open end, bounds inclusive
+RANGE_FILTERS = {
+    "drop": "drop_mm",
+    "weight": "weight_g",
+    "price": "price_tl",
+}
+
+def range_params(params: dict) -> dict:
+    """params içindeki etkin aralıklar {param: (lo, hi)}; eksik ve (None, None) olanlar atlanır."""
+    active = {}
+    for name in RANGE_FILTERS:
+        bounds = params.get(name)
+        if bounds is not None and (bounds[0] is not None or bounds[1] is not None):
+            active[name] = (bounds[0], bounds[1])
+    return active
+
+def range_mask(df_norm: pd.DataFrame, active: dict) -> np.ndarray:
+    """Index'siz yol: tipli sütunlarda vektörel karşılaştırma (NaN hiçbir aralığa girmez)."""
+    mask = np.ones(len(df_norm), dtype=bool)
+    for name, (lo, hi) in active.items():
+        x = df_norm[RANGE_FILTERS[name]].to_numpy(dtype=float)
+        if lo is not None:
+            mask &= x >= lo
+        if hi is not None:
+            mask &= x <= hi
+    return mask
+
+class SpecIndex:
+    """Her spec için değere göre sıralı satır konumları (eksikler hariç); bir aralık = iki searchsorted."""
+
+    def __init__(self, df_norm: pd.DataFrame):
+        self.n = len(df_norm)
+        self.by_row, self.order, self.values = {}, {}, {}
+        for name, col in RANGE_FILTERS.items():
+            x = df_norm[col].to_numpy(dtype=float)
+            order = np.argsort(x, kind="stable")[:np.count_nonzero(~np.isnan(x))]  # NaN sorts last
+            self.by_row[name] = x
+            self.order[name] = order.astype(np.int32)
+            self.values[name] = x[order]
+
+    def bounds(self, name: str):
+        """(en küçük, en büyük) değer; sütunda hiç değer yoksa None."""
+        v = self.values[name]
+        return (float(v[0]), float(v[-1])) if len(v) else None
+
+    def span(self, name: str, lo=None, hi=None):
+        """values[name][i:j] aralığın sıralı değerleri, order[name][i:j] satırları."""
+        v = self.values[name]
+        i = 0 if lo is None else int(np.searchsorted(v, lo, side="left"))
+        j = len(v) if hi is None else int(np.searchsorted(v, hi, side="right"))
+        return i, max(i, j)
+
+    def rows(self, name: str, lo=None, hi=None) -> np.ndarray:
+        """lo <= değer <= hi olan satırlar (değer sırasıyla)."""
+        i, j = self.span(name, lo, hi)
+        return self.order[name][i:j]
+
+    def filter(self, positions: np.ndarray, active: dict) -> np.ndarray:
+        """
+        Sıralı positions'tan aralıkları sağlayanlar. Aralık adaylardan darsa satırları sıralanıp
+        adaylarda ikili aramayla aranır; değilse yalnızca adayların tipli değerleri karşılaştırılır.
+        """
+        for name, (lo, hi) in active.items():
+            i, j = self.span(name, lo, hi)
+            if i == j:
+                return positions[:0]
+            if j - i < len(positions):
+                rows = np.sort(self.order[name][i:j])
+                at = np.minimum(np.searchsorted(positions, rows), len(positions) - 1)
+                positions = rows[positions[at] == rows].astype(positions.dtype)
+            else:
+                v, x = self.values[name], self.by_row[name][positions]
+                positions = positions[(x >= v[i]) & (x <= v[j - 1])]
+        return positions
+
+    def mask(self, active: dict) -> np.ndarray:
+        """Tüm aralıkları sağlayan satırlar; her satır bir spec'te en fazla bir kez sayılır."""
+        hits = np.zeros(self.n, dtype=np.int8)
+        for name, (lo, hi) in active.items():
+            hits[self.rows(name, lo, hi)] += 1
+        return hits == len(active)
+
+# -----------------------------
+# Weighted scoring (top-k when the hard filters return nothing)
+# -----------------------------
+HARD_PARAMS = ("gender", "surface")
+# soft predicate key -> weight (integer so ties break deterministically on catalog order)
+SCORE_WEIGHTS = {
+    "q3=yaris": 3,
+    "q3=antrenman": 3,
+    "q4_is_long": 2,
+    "q5_orta_uzun": 2,
+    "q6_injury_ok": 4,
+    "q7_pronation_yes": 4,
+}
+
+class Scorer:
+    """
+    Q1/Q2 (cinsiyet, zemin) maske olarak zorunlu kalır; Q3..Q7 ağırlıklı özellik sütunlarıdır.
+    Skor = sağlanan cevapların ağırlık toplamı; top-k argpartition ile seçilir (tam sıralama yok).
+    """
+
+    def __init__(self, index: FilterIndex):
+        self.index = index
+        self.n = index.n
+        self.features = {key: np.unpackbits(index.bits[key], count=self.n).astype(np.int64) for key in SCORE_WEIGHTS}
+
+    def soft_keys(self, params: dict) -> list:
+        return [ANSWER_OPTIONS[name][params[name]] for name in ANSWER_OPTIONS
+                if name not in HARD_PARAMS and params.get(name) is not None
+                and ANSWER_OPTIONS[name][params[name]] is not None]
+
+    def candidates(self, params: dict) -> np.ndarray:
+        acc = None
+        for name in HARD_PARAMS:
+            key = ANSWER_OPTIONS[name].get(params.get(name))
+            if key is not None:
+                acc = self.index.bits[key].copy() if acc is None else np.bitwise_and(acc, self.index.bits[key], out=acc)
+        return np.arange(self.n) if acc is None else np.flatnonzero(np.unpackbits(acc, count=self.n))
+
+    def top_k(self, params: dict, k: int = 20, allowed: np.ndarray = None):
+        """
+        (positions, scores, max_score): en yüksek skordan düşüğe, eşitlikte katalog sırası.
+        allowed (bool, satır başına) verilirse adaylar onunla daraltılır (ör. aralık filtreleri).
+        """
+        pos = self.candidates(params)
+        if allowed is not None:
+            pos = pos[allowed[pos]]
+        keys = self.soft_keys(params)
+        max_score = sum(SCORE_WEIGHTS[key] for key in keys)
+        scores = np.zeros(len(pos), dtype=np.int64)
+        for key in keys:
+            scores += SCORE_WEIGHTS[key] * self.features[key][pos]
+        if len(pos) == 0 or k <= 0:
+            return pos[:0], scores[:0], max_score
+        rank = scores * self.n - pos  # higher is better; unique per row
+        if k < len(pos):
+            pick = np.argpartition(-rank, k - 1)[:k]
+        else:
+            pick = np.arange(len(pos))
+        pick = pick[np.argsort(-rank[pick])]
+        return pos[pick], scores[pick], max_score
+
+# -----------------------------
+# Free-text model search (token + trigram inverted index)
+# -----------------------------
+SEARCH_LETTERS = ("B", "D", "E", "F", "H")  # Brand, ModelName, Family, Model, MR
+SEARCH_TOKEN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")  # "fd8311.600" stays one token
+FUZZY_MIN_DICE = 0.5
+
+def search_tokens(text) -> list:
+    return SEARCH_TOKEN.findall(norm_token(text))
+
+def trigrams(token: str) -> list:
+    padded = f"${token}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _gather(offsets: np.ndarray, values: np.ndarray, keys: np.ndarray):
+    """CSR'da keys'in değer dilimlerini tek dizide birleştirir; (values, dilim uzunlukları)."""
+    starts, lens = offsets[keys], offsets[keys + 1] - offsets[keys]
+    total = int(lens.sum())
+    shift = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+    return values[shift + np.arange(total)], lens
+
+def _csr(keys: np.ndarray, values: np.ndarray, n_keys: int):
+    """(offsets, values sıralı): key k'nin değerleri values[offsets[k]:offsets[k+1]]."""
+    order = np.lexsort((values, keys))
+    offsets = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+    return offsets, values[order]
+
+class SearchIndex:
+    """
+    Marka / model / SKU sütunlarının token'ları -> satır listeleri. Sorgu kelimesi başına:
+    tam eşleşme 1.0, önek (sıralı sözlükte ikili arama) 0.5..0.9, yazım hatası (harf token'larında
+    trigram Dice >= FUZZY_MIN_DICE) en çok 0.8. Satır skoru kelimelerin en iyi skorlarının toplamı;
+    daha çok kelimesi eşleşen satır önce gelir.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns):
+        self.n = len(df)
+        per_col = []  # (row codes, tokens of each distinct value) per column
+        vocab = set()
+        for c in columns:
+            codes, uniques = unique_codes(df[c])
+            toks = [search_tokens(u) if pd.notna(u) else [] for u in uniques]
+            per_col.append((codes, toks))
+            for t in toks:
+                vocab.update(t)
+        self.vocab = np.array(sorted(vocab), dtype=object)
+        tok_id = {t: i for i, t in enumerate(self.vocab)}
+        rows, ids = [], []
+        for codes, toks in per_col:
+            # unique value -> token ids (CSR), expanded to rows without a Python loop over rows
+            lens = np.array([len(t) for t in toks], dtype=np.int64)
+            flat = np.array([tok_id[x] for t in toks for x in t], dtype=np.int64)
+            starts = np.concatenate([[0], np.cumsum(lens)[:-1]])
+            per_row = lens[codes]
+            total = int(per_row.sum())
+            first = np.repeat(np.cumsum(per_row) - per_row, per_row)
+            rows.append(np.repeat(np.arange(self.n), per_row))
+            ids.append(flat[np.repeat(starts[codes], per_row) + np.arange(total) - first])
+        # (token, row) pairs sorted and deduplicated (a token can occur in several columns of a row)
+        pairs = np.sort(np.concatenate(ids) * self.n + np.concatenate(rows)) if rows else np.array([], dtype=np.int64)
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // max(self.n, 1), minlength=len(self.vocab)), out=self.offsets[1:])
+        self.rows = pairs % max(self.n, 1)
+
+        fuzzy = [i for i, t in enumerate(self.vocab) if t.isalpha() and len(t) >= 3]
+        grams = {}
+        gram_keys, gram_tokens = [], []
+        for i in fuzzy:
+            for g in set(trigrams(self.vocab[i])):
+                gram_keys.append(grams.setdefault(g, len(grams)))
+                gram_tokens.append(i)
+        self.grams = grams
+        self.gram_count = np.array([len(t) for t in self.vocab], dtype=np.int64)  # len(trigrams(t)) == len(t)
+        self.gram_offsets, self.gram_tokens = _csr(np.array(gram_keys, dtype=np.int64),
+                                                   np.array(gram_tokens, dtype=np.int64), len(grams))
+
+    def match_word(self, word: str):
+        """(token ids, skorlar): tam / önek / trigram benzerliği."""
+        lo = int(np.searchsorted(self.vocab, word, side="left"))
+        hi = int(np.searchsorted(self.vocab, word + "\uffff", side="left"))
+        ids = np.arange(lo, hi)
+        lens = np.array([len(t) for t in self.vocab[lo:hi]], dtype=np.float64)
+        scores = np.where(lens == len(word), 1.0, 0.5 + 0.4 * len(word) / np.maximum(lens, 1))
+        if word.isalpha() and len(word) >= 3:
+            q = [self.grams[g] for g in set(trigrams(word)) if g in self.grams]
+            if q:
+                cand, _ = _gather(self.gram_offsets, self.gram_tokens, np.array(q, dtype=np.int64))
+                cand, shared = np.unique(cand, return_counts=True)
+                dice = 2 * shared / (self.gram_count[cand] + len(trigrams(word)))
+                keep = (dice >= FUZZY_MIN_DICE) & ((cand < lo) | (cand >= hi))  # prefix hits already scored
+                ids = np.concatenate([ids, cand[keep]])
+                scores = np.concatenate([scores, 0.8 * dice[keep]])
+        return ids, scores
+
+    def search(self, query: str, k: int = 50):
+        """(positions, skorlar, eşleşen kelime sayısı), en iyiden kötüye; eşitlikte katalog sırası."""
+        words = list(dict.fromkeys(search_tokens(query)))
+        empty = np.array([], dtype=np.int64)
+        if not words or self.n == 0 or k <= 0:
+            return empty, empty.astype(float), empty
+        per_word = []  # (rows, best token score per row), rows unique
+        for word in words:
+            ids, scores = self.match_word(word)
+            if len(ids) == 0:
+                continue
+            rows, lens = _gather(self.offsets, self.rows, ids)
+            best = np.repeat(scores, lens)
+            if len(ids) > 1:
+                order = np.lexsort((-best, rows))
+                rows, best = rows[order], best[order]
+                first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+                rows, best = rows[first], best[first]
+            per_word.append((rows, best))
+        if not per_word:
+            return empty, empty.astype(float), empty
+        if len(per_word) == 1:
+            pos, total = per_word[0]
+            hits = np.ones(len(pos), dtype=np.int64)
+        else:
+            total, hits = np.zeros(self.n), np.zeros(self.n, dtype=np.int64)
+            for rows, best in per_word:
+                total[rows] += best
+                hits[rows] += 1
+            pos = np.flatnonzero(hits)
+            total, hits = total[pos], hits[pos]
+        # integer rank, unique per row: more words matched, then higher score, then catalog order
+        rank = (hits * (1000 * len(words) + 1) + np.round(total * 1000).astype(np.int64)) * self.n - pos
+        pick = np.argpartition(-rank, k - 1)[:k] if k < len(pos) else np.arange(len(pos))
+        pick = pick[np.argsort(-rank[pick])]
+        return pos[pick], total[pick], hits[pick]
+
+# -----------------------------
+# "Similar shoes": k-NN over standardized attributes
+# -----------------------------
+SIMILAR_NUMERIC = ("drop_mm", "price_tl", "weight_g")  # typed spec columns (SPEC_COLUMNS)
+SIMILAR_CATEGORICAL = ("L", "N", "O", "P", "q5_group")  # Cushioning, Carbon Plate, Pronation, Activity, distance group
+SIMILAR_GROUP_LETTER = "F"  # Model: other colours of the same shoe are not "similar shoes"
+SIMILAR_CHUNK = 64  # batch queries per distance block (64 x n float32)
+
+class SimilarityIndex:
+    """
+    Satır başına özellik vektörü: sayısal sütunlar z-skoru (eksik = ortalama = 0), kategorikler
+    one-hot * sqrt(1/2) (farklı kategori uzaklığa 1 ekler). Komşular öklid uzaklığıyla; aynı model
+    ve (varsayılan) farklı cinsiyet dışarıda kalır.
+    """
+
+    def __init__(self, df: pd.DataFrame, numeric, categorical, group=None, gender=None, label=None):
+        blocks = []
+        for c in numeric:
+            x = df[c].to_numpy(dtype=float)
+            if np.isfinite(x).any():
+                x = (x - np.nanmean(x)) / (np.nanstd(x) or 1.0)
+            blocks.append(np.nan_to_num(x)[:, None])
+        for c in categorical:
+            codes, _ = pd.factorize(df[c])  # missing -> -1 -> all-zero row
+            onehot = np.zeros((len(df), codes.max(initial=-1) + 1))
+            onehot[np.flatnonzero(codes >= 0), codes[codes >= 0]] = np.sqrt(0.5)
+            blocks.append(onehot)
+        self.features = np.hstack(blocks).astype(np.float32) if blocks else np.zeros((len(df), 0), np.float32)
+        self.sq = (self.features.astype(np.float64) ** 2).sum(axis=1).astype(np.float32)
+        self.group = pd.factorize(df[group])[0] if group is not None else None
+        self.gender = pd.factorize(df[gender])[0] if gender is not None else None
+        # SKU text for batch tables, converted once per index instead of once per query block
+        self.label = label
+        self.labels = df[label].astype(str).to_numpy(dtype=object) if label is not None else None
+
+    def query(self, positions, k: int = 10, same_gender: bool = True):
+        """
+        positions'daki her satır için (komşu pozisyonları, uzaklıklar), ikisi de (len(positions), k);
+        yakından uzağa, eşitlikte katalog sırası. Yeterli aday yoksa kalan yerler -1 / inf.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        n = len(self.features)
+        k = max(0, min(k, n))
+        out_pos = np.full((len(positions), k), -1, dtype=np.int64)
+        out_dist = np.full((len(positions), k), np.inf, dtype=np.float32)
+        if k == 0:
+            return out_pos, out_dist
+        for start in range(0, len(positions), SIMILAR_CHUNK):
+            q = positions[start:start + SIMILAR_CHUNK]
+            d2 = self.sq[q, None] + self.sq[None, :] - 2 * self.features[q] @ self.features.T
+            d2[np.arange(len(q)), q] = np.inf
+            if self.group is not None:
+                d2[self.group[q, None] == self.group[None, :]] = np.inf
+            if same_gender and self.gender is not None:
+                d2[self.gender[q, None] != self.gender[None, :]] = np.inf
+            for i, row in enumerate(d2):
+                kth = np.partition(row, k - 1)[k - 1]
+                cand = np.flatnonzero((row <= kth) & np.isfinite(row))  # ties with the k-th kept, catalog order
+                order = cand[np.argsort(row[cand], kind="stable")][:k]
+                out_pos[start + i, :len(order)] = order
+                out_dist[start + i, :len(order)] = np.sqrt(np.maximum(row[order], 0))
+        return out_pos, out_dist
 
 # -----------------------------
 # URL helpers (for Streamlit Cloud secrets)
@@ -174,49 +845,1194 @@ def fix_cloud_link(u: str) -> str:
             url = url + f"{sep}download=1"
     return url
 
-@st.cache_data(show_spinner=False)
-def fetch_bytes(url: str) -> bytes:
+# Remote catalog cache: conditional GET (ETag / Last-Modified), revalidated after a TTL.
+# Bodies are streamed into a spooled temp file (RAM up to SPOOL_MEMORY_BYTES, then disk).
+DEFAULT_FETCH_TTL = 300  # seconds
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+CHUNK_BYTES = 256 * 1024
+
+@dataclass
+class RemoteEntry:
+    url: str
+    body: tempfile.SpooledTemporaryFile
+    size: int
+    kind: str  # sniff_format() sonucu
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    checked_at: float
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def read_bytes(self) -> bytes:
+        with self.lock:
+            if not self.body.closed:
+                self.body.seek(0)
+                return self.body.read()
+        return fetch_remote(self.url).read_bytes()  # evicted from _REMOTE: fetch again
+
+CATALOG_CACHE_ENTRIES = 8  # _cached_catalog max_entries; remote bodies are kept for as many URLs
+_REMOTE = OrderedDict()  # resolved url -> RemoteEntry, least recently used first
+_REMOTE_LOCKS = {}
+_REMOTE_GUARD = threading.Lock()
+
+def sniff_format(head: bytes) -> str:
+    """Dosya türünü ilk byte'lardan tahmin eder (URL uzantısına bakmadan)."""
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    if head.startswith(b"\x1f\x8b"):
+        return "csv.gz"
+    return "csv"
+
+def _stream_to_spool(r, max_bytes: int, progress=None):
+    total = int(r.headers.get("Content-Length") or 0) or None
+    if total is not None and total > max_bytes:
+        raise ValueError(f"Remote file is {total} bytes, limit is {max_bytes}.")
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    sha = hashlib.sha1()
+    head = b""
+    size = 0
+    try:
+        for chunk in r.iter_content(CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"Remote file exceeds the {max_bytes} byte limit.")
+            if len(head) < 8:
+                head += chunk[:8]
+            sha.update(chunk)
+            body.write(chunk)
+            if progress is not None:
+                progress(size, total)
+    except Exception:
+        body.close()
+        raise
+    return body, size, sniff_format(head), sha.hexdigest()
+
+def fetch_remote(url: str, ttl: float = None, max_bytes: int = None, progress=None, session=None) -> RemoteEntry:
+    """
+    URL'yi parça parça indirir ve süreç içinde saklar. TTL dolana kadar ağa çıkmaz;
+    dolunca If-None-Match / If-Modified-Since ile yeniden doğrular. 304 gelirse eldeki
+    içerik (ve digest'i) aynen kullanılır. progress(indirilen, toplam|None) her parçada çağrılır.
+    En son kullanılan CATALOG_CACHE_ENTRIES URL saklanır; düşen gövde kapatılır (RAM / geçici dosya).
+    """
     import requests
+    ttl = DEFAULT_FETCH_TTL if ttl is None else ttl
+    max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
     url = fix_cloud_link(url)
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    return r.content
-
-def load_from_url(url: str) -> pd.DataFrame:
-    data = fetch_bytes(url)
-    low = url.lower()
-    bio = io.BytesIO(data)
-    if any(low.endswith(ext) for ext in [".xlsx",".xlsm",".xls"]):
+    with _REMOTE_GUARD:
+        lock = _REMOTE_LOCKS.setdefault(url, threading.Lock())
+    with lock, timed_stage("fetch") as rec:
+        entry = _REMOTE.get(url)
+        now = time.time()
+        if entry is not None and now - entry.checked_at < ttl:
+            with _REMOTE_GUARD:
+                if url in _REMOTE:
+                    _REMOTE.move_to_end(url)
+            rec["cache"] = "hit"
+            return entry
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        with (session or requests).get(url, headers=headers, timeout=60, stream=True) as r:
+            if r.status_code == 304 and entry is not None:
+                entry.checked_at = now
+                rec["cache"] = "not_modified"
+                return entry
+            r.raise_for_status()
+            body, size, kind, digest = _stream_to_spool(r, max_bytes, progress)
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        # the old entry is not closed: sessions that already hold it may still be reading; its spool
+        # (RAM or temp file) is released when the last reference goes away
+        entry = RemoteEntry(
+            url=url,
+            body=body,
+            size=size,
+            kind=kind,
+            digest=digest,
+            etag=etag,
+            last_modified=last_modified,
+            checked_at=now,
+        )
+        with _REMOTE_GUARD:
+            _REMOTE[url] = entry
+            _REMOTE.move_to_end(url)
+            evicted = [_REMOTE.popitem(last=False)[1] for _ in range(len(_REMOTE) - CATALOG_CACHE_ENTRIES)]
+        for old in evicted:  # a reader holding the lock finishes first; later reads fetch again
+            with old.lock:
+                old.body.close()
+        rec["cache"], rec["nbytes"] = "miss", size
+        return entry
+
+def remote_nbytes(url: str) -> int:
+    """URL için saklanan gövdenin boyutu (saklanmıyorsa 0)."""
+    entry = _REMOTE.get(fix_cloud_link(url))
+    return entry.size if entry is not None and not entry.body.closed else 0
+
+def forget_remote(url: str):
+    """URL'nin saklanan gövdesini bırakır ve kapatır (CatalogRegistry eviction); tutan okuyucu yeniden indirir."""
+    with _REMOTE_GUARD:
+        entry = _REMOTE.pop(fix_cloud_link(url), None)
+    if entry is not None:
+        with entry.lock:
+            entry.body.close()
+
+def fetch_bytes(url: str, ttl: float = None) -> bytes:
+    return fetch_remote(url, ttl=ttl).read_bytes()
+
+def read_remote(entry: RemoteEntry) -> pd.DataFrame:
+    # Format is known from the magic bytes; parse straight from the spool, no second buffer
+    with entry.lock:
+        if not entry.body.closed:
+            entry.body.seek(0)
+            if entry.kind in ("xlsx", "xls"):
+                return read_data_sheet(entry.body)[0]
+            return pd.read_csv(entry.body, compression="gzip" if entry.kind == "csv.gz" else None)
+    return read_remote(fetch_remote(entry.url))  # evicted from _REMOTE: fetch again
+
+def load_from_url(url: str, ttl: float = None, progress=None) -> pd.DataFrame:
+    return read_remote(fetch_remote(url, ttl=ttl, progress=progress))
+
+# -----------------------------
+# Load metrics & sheet-name matching
+# -----------------------------
+LOAD_STATS = Counter()  # process totals: workbook_opens, snapshot_reads
+_LOAD_STATS_LOCK = threading.Lock()
+_load_local = threading.local()  # per-thread counts while a catalog is being built
+
+def count_load(event: str, n: int = 1):
+    with _LOAD_STATS_LOCK:
+        LOAD_STATS[event] += n
+    current = getattr(_load_local, "counts", None)
+    if current is not None:
+        current[event] += n
+
+# -----------------------------
+# Stage timing (debug sidebar panel + Prometheus text)
+# -----------------------------
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+class StageMetrics:
+    """Süreç geneli aşama sayaçları: süre histogramı, satır giriş/çıkış, byte, cache sonucu."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage: str, seconds: float, rows_in=None, rows_out=None, cache=None, nbytes=None):
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = {"count": 0, "sum": 0.0, "buckets": [0] * (len(self.buckets) + 1),
+                                           "rows_in": 0, "rows_out": 0, "bytes": 0, "cache": Counter()}
+            s["count"] += 1
+            s["sum"] += seconds
+            s["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            s["rows_in"] += rows_in or 0
+            s["rows_out"] += rows_out or 0
+            s["bytes"] += nbytes or 0
+            if cache:
+                s["cache"][cache] += 1
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            stages = {name: {**s, "buckets": list(s["buckets"]), "cache": Counter(s["cache"])} for name, s in self._stages.items()}
+        out = ["# HELP grlsz_stage_seconds Wall time per pipeline stage.", "# TYPE grlsz_stage_seconds histogram"]
+        for name, s in stages.items():
+            acc = 0
+            for le, n in zip([*map(str, self.buckets), "+Inf"], s["buckets"]):
+                acc += n
+                out.append(f'grlsz_stage_seconds_bucket{{stage="{name}",le="{le}"}} {acc}')
+            out.append(f'grlsz_stage_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+            out.append(f'grlsz_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        for metric, key, help_text in [("grlsz_stage_rows_in_total", "rows_in", "Rows entering a stage."),
+                                       ("grlsz_stage_rows_out_total", "rows_out", "Rows leaving a stage."),
+                                       ("grlsz_stage_bytes_total", "bytes", "Bytes downloaded or exported.")]:
+            out += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            out += [f'{metric}{{stage="{name}"}} {s[key]}' for name, s in stages.items()]
+        out += ["# HELP grlsz_stage_cache_total Cache results per stage.", "# TYPE grlsz_stage_cache_total counter"]
+        out += [f'grlsz_stage_cache_total{{stage="{name}",result="{result}"}} {n}'
+                for name, s in stages.items() for result, n in sorted(s["cache"].items())]
+        return "\n".join(out) + "\n"
+
+METRICS = StageMetrics()
+_stage_local = threading.local()  # events of the current script run (Streamlit) for the debug panel
+
+@contextmanager
+def timed_stage(stage: str, rows_in: int = None):
+    """Süreyi ölçer; çağıran rec'e rows_out / cache / nbytes yazabilir."""
+    rec = {"stage": stage, "rows_in": rows_in, "rows_out": None, "cache": None, "nbytes": None}
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["seconds"] = time.perf_counter() - t0
+        METRICS.observe(**rec)
+        events = getattr(_stage_local, "events", None)
+        if events is not None:
+            events.append(rec)
+
+def metrics_text() -> str:
+    """Prometheus text formatı: aşama metrikleri + workbook/snapshot yükleme sayaçları."""
+    with _LOAD_STATS_LOCK:
+        loads = dict(LOAD_STATS)
+    out = [METRICS.prometheus_text().rstrip("\n"),
+           "# HELP grlsz_load_events_total Workbook opens and snapshot reads.", "# TYPE grlsz_load_events_total counter"]
+    out += [f'grlsz_load_events_total{{event="{event}"}} {n}' for event, n in sorted(loads.items())]
+    return "\n".join(out) + "\n"
+
+_METRICS_SERVER = None
+_METRICS_SERVER_LOCK = threading.Lock()
+_METRICS_BIND_ERROR = None  # (port, error): logged once, not retried on every rerun
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """
+    GET /metrics sunan küçük HTTP sunucusu; süreç başına bir kez başlatılır. Port kullanılamıyorsa
+    (başka süreç / eski modül kopyası) hata bir kez loglanır ve None döner; uygulama çalışmaya devam eder.
+    """
+    global _METRICS_SERVER, _METRICS_BIND_ERROR
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _METRICS_SERVER_LOCK:
+        if _METRICS_SERVER is None:
+            if _METRICS_BIND_ERROR is not None and _METRICS_BIND_ERROR[0] == port:
+                return None
+            try:
+                _METRICS_SERVER = ThreadingHTTPServer((host, port), MetricsHandler)
+            except OSError as e:
+                _METRICS_BIND_ERROR = (port, str(e))
+                log.warning("metrics server not started on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_METRICS_SERVER.serve_forever, daemon=True, name="grlsz-metrics").start()
+        return _METRICS_SERVER
+
+def sheet_key(name: str) -> str:
+    # Case- and Turkish-insensitive: 'İ' -> 'i' via NFKD, dotless 'ı' -> 'i'
+    return norm_token(name).replace("ı", "i")
+
+def match_sheet_name(names, wanted=("Data",)):
+    """İstenen sayfayı önce birebir, sonra büyük/küçük harf ve Türkçe karakter duyarsız arar."""
+    names = list(names)
+    for w in wanted:
+        if w in names:
+            return w
+    folded = {}
+    for n in names:
+        folded.setdefault(sheet_key(n), n)
+    for w in wanted:
+        if sheet_key(w) in folded:
+            return folded[sheet_key(w)]
+    return None
+
+# -----------------------------
+# Lean XLSX reader (sheet XML + sharedStrings only)
+# -----------------------------
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_XML_ESCAPE = re.compile(r"_x([0-9A-Fa-f]{4})_")  # OOXML escape; "_x005F_" is a literal "_"
+
+def _col_index(letters: str) -> int:
+    val = 0
+    for ch in letters:
+        val = val * 26 + (ord(ch) - 64)
+    return val - 1
+
+def _si_text(node) -> str:
+    # <si><t>..</t></si> or rich text runs <si><r><t>..</t></r>..</si>; phonetic <rPh> is skipped
+    parts = []
+    for child in node:
+        if child.tag == _NS_MAIN + "t":
+            parts.append(child.text or "")
+        elif child.tag == _NS_MAIN + "r":
+            t = child.find(_NS_MAIN + "t")
+            if t is not None:
+                parts.append(t.text or "")
+    return unescape_ooxml("".join(parts))
+
+def unescape_ooxml(text: str) -> str:
+    """'_x000D_' -> '\\r'; '_x005F_x000D_' -> '_x000D_' (tek geçiş, soldan sağa)."""
+    if "_x" not in text:
+        return text
+    return _XML_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), text)
+
+def xlsx_sheets(zf: zipfile.ZipFile) -> dict:
+    """workbook.xml + rels tek geçişte okunur: {sayfa adı: zip içindeki XML yolu}."""
+    targets = {}
+    with zf.open("xl/_rels/workbook.xml.rels") as fh:
+        for rel in ET.parse(fh).getroot().iter(_NS_PKG_REL + "Relationship"):
+            target = rel.get("Target", "")
+            targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else "xl/" + target
+    sheets = {}
+    with zf.open("xl/workbook.xml") as fh:
+        for sheet in ET.parse(fh).getroot().iter(_NS_MAIN + "sheet"):
+            sheets[sheet.get("name")] = targets.get(sheet.get(_NS_REL + "id"))
+    return sheets
+
+@dataclass
+class DateStyles:
+    """styles.xml'deki tarih / süre biçimli hücre stilleri (cellXfs sırası, 's' özniteliği) ve tarih başlangıcı."""
+    dates: frozenset
+    timedeltas: frozenset
+    epoch: object
+
+def _date_styles(zf: zipfile.ZipFile) -> DateStyles:
+    # Same classification as openpyxl (what pd.read_excel used), so serials become the same objects
+    from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+    from openpyxl.utils.datetime import WINDOWS_EPOCH, CALENDAR_MAC_1904
+    epoch = WINDOWS_EPOCH
+    with zf.open("xl/workbook.xml") as fh:
+        pr = ET.parse(fh).getroot().find(_NS_MAIN + "workbookPr")
+        if pr is not None and pr.get("date1904", "").lower() in ("1", "true"):
+            epoch = CALENDAR_MAC_1904
+    dates, timedeltas = set(), set()
+    if "xl/styles.xml" in zf.namelist():
+        with zf.open("xl/styles.xml") as fh:
+            root = ET.parse(fh).getroot()
+        custom = {int(f.get("numFmtId")): f.get("formatCode") for f in root.iter(_NS_MAIN + "numFmt")}
+        xfs = root.find(_NS_MAIN + "cellXfs")
+        for idx, xf in enumerate(xfs if xfs is not None else ()):
+            fmt_id = int(xf.get("numFmtId", 0))
+            fmt = custom[fmt_id] if fmt_id in custom else builtin_format_code(fmt_id)
+            if is_date_format(fmt):
+                dates.add(str(idx))
+            if is_timedelta_format(fmt):
+                timedeltas.add(str(idx))
+    return DateStyles(frozenset(dates), frozenset(timedeltas), epoch)
+
+def _excel_date(serial, styles: DateStyles, style: str):
+    from openpyxl.utils.datetime import from_excel
+    try:
+        return from_excel(serial, styles.epoch, timedelta=style in styles.timedeltas)
+    except (OverflowError, ValueError):
+        return np.nan  # openpyxl marks out-of-range dates as errors
+
+def _shared_strings(zf: zipfile.ZipFile) -> list:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as fh:
+        for _, node in ET.iterparse(fh):
+            if node.tag == _NS_MAIN + "si":
+                strings.append(_si_text(node))
+                node.clear()
+    return strings
+
+def _cell_value(c, strings, styles: DateStyles = None):
+    # Same conversions as pandas' openpyxl reader (empty -> "", error -> NaN, integral -> int, date style -> datetime)
+    t = c.get("t", "n")
+    if t == "inlineStr":
+        node = c.find(_NS_MAIN + "is")
+        return _si_text(node) if node is not None else ""
+    v = c.find(_NS_MAIN + "v")
+    if v is None or v.text is None:
+        return ""
+    if t == "s":
+        return strings[int(v.text)]
+    if t == "n":
+        num = float(v.text)
+        num = int(num) if num.is_integer() else num
+        if styles is not None and styles.dates and c.get("s") in styles.dates:
+            return _excel_date(num, styles, c.get("s"))
+        return num
+    if t == "b":
+        return v.text == "1"
+    if t == "e":
+        return np.nan
+    if t == "d":  # ISO 8601 date text
+        from openpyxl.utils.datetime import from_ISO8601
         try:
-            return pd.read_excel(bio, sheet_name="Data")
-        except Exception:
-            bio.seek(0)
-            return pd.read_excel(bio, sheet_name="DATA")
-    if any(low.endswith(ext) for ext in [".csv",".csv.gz",".txt"]):
-        bio.seek(0)
-        return pd.read_csv(bio)
-    # Fallback guess
+            return from_ISO8601(v.text)
+        except ValueError:
+            return v.text
+    return v.text  # "str" (formula result)
+
+def read_xlsx_sheet(src, sheet_names=("Data",), usecols=None):
+    """
+    Sadece workbook.xml, sharedStrings.xml, styles.xml (yalnızca sayı biçimleri) ve hedef sayfanın
+    XML'ini okuyan hafif .xlsx okuyucu (tema, yazıcı ayarları açılmaz). (DataFrame, sayfa adı) döner.
+
+    - sheet_names: aranan sayfa adları (workbook.xml'den tek seferde, match_sheet_name ile)
+    - usecols: başlık adları; diğer sütunların hücreleri hiç üretilmez
+
+    Tarih biçimli sayısal hücreler pd.read_excel'deki gibi datetime / time / timedelta olur.
+    """
+    from pandas.io.parsers import TextParser
+    with zipfile.ZipFile(src) as zf:
+        sheets = xlsx_sheets(zf)
+        name = match_sheet_name(sheets, sheet_names)
+        if name is None:
+            raise ValueError(f"Worksheet named {sheet_names[0]!r} not found (sheets: {', '.join(sheets)})")
+        strings = _shared_strings(zf)
+        styles = _date_styles(zf)
+
+        keep = None  # column positions to materialize (None = all)
+        data = []
+        last_row_with_data = -1
+        with zf.open(sheets[name]) as fh:
+            for _, row in ET.iterparse(fh):
+                if row.tag != _NS_MAIN + "row":
+                    continue
+                r = int(row.get("r", len(data) + 1)) - 1
+                while len(data) < r:  # rows missing from the XML are empty
+                    data.append([])
+                values = {}
+                for pos, c in enumerate(row.iter(_NS_MAIN + "c")):
+                    ref = c.get("r")
+                    col = _col_index(_CELL_REF.match(ref).group(1)) if ref else pos
+                    if keep is not None and col not in keep:
+                        continue
+                    values[col] = _cell_value(c, strings, styles)
+                row.clear()
+                if keep is None and usecols is not None and r == 0:
+                    keep = {col for col, v in values.items() if v in usecols}
+                    values = {col: v for col, v in values.items() if col in keep}
+                cols = sorted(keep) if keep is not None else range(max(values, default=-1) + 1)
+                converted = [values.get(col, "") for col in cols]
+                while converted and converted[-1] == "":
+                    converted.pop()
+                if converted:
+                    last_row_with_data = len(data)
+                data.append(converted)
+
+    data = data[: last_row_with_data + 1]
+    if data:
+        width = max(len(row) for row in data)
+        data = [row + [""] * (width - len(row)) for row in data]
+    df = TextParser(data, header=0, skip_blank_lines=False).read()
+    count_load("workbook_opens")  # counted once the sheet was read: a fallback to openpyxl is one open
+    return df, name
+
+# -----------------------------
+# Columnar snapshot (Feather) next to the workbook
+# -----------------------------
+SNAPSHOT_FORMAT = 4  # bump when the normalized columns change
+
+def snapshot_path(path) -> Path:
+    return Path(path).with_suffix(".feather")
+
+def workbook_digest(path, rules: RuleSet = None) -> str:
+    rules = rules or load_rules()
+    sha = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            sha.update(chunk)
+    return f"{SNAPSHOT_FORMAT}:{rules.digest}:{sha.hexdigest()}"
+
+def column_label(c):
+    """JSON'a yazılabilir sütun adı: str / int / float aynen (numpy sayıları Python'a), diğerleri (tarih başlık) str."""
+    if isinstance(c, (bool, np.bool_)):
+        return str(c)
+    if isinstance(c, (int, np.integer)):
+        return int(c)
+    if isinstance(c, (float, np.floating)):
+        return float(c)
+    return c if isinstance(c, str) else str(c)
+
+def text_mixed_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Sığ kopya: karışık tipli object sütunlar (ör. Family: str + int) metne çevrilir; eksikler eksik kalır."""
+    frame = frame.copy(deep=False)
+    for c in frame.columns:
+        if frame[c].dtype == object and pd.api.types.infer_dtype(frame[c], skipna=True).startswith("mixed"):
+            frame[c] = frame[c].where(frame[c].isna(), frame[c].astype(str))
+    return frame
+
+def prepare_raw(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Okunan sayfa -> katalogun ham tablosu; snapshot'lı ve snapshot'sız yol aynı tabloyu kurar:
+    karışık tipli sütunlar metne, sütun adları column_label ile, tekrarlı metin categorical.
+    """
+    df_raw = text_mixed_columns(df_raw)
+    df_raw.columns = [column_label(c) for c in df_raw.columns]
+    return compact_columns(df_raw)
+
+def arrow_safe_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Arrow'a yazılabilir sığ kopya: karışık tipli object sütunlar metne, sütun adları str'ye çevrilir."""
+    frame = text_mixed_columns(frame)
+    frame.columns = [str(c) for c in frame.columns]
+    return frame
+
+def write_snapshot(path, dfn: pd.DataFrame, n_raw: int, sheet, digest: str) -> Path:
+    """
+    Normalize edilmiş görünümü (ham sütunlar + q1..q7 + sayısal spec sütunları) sıkıştırmasız Feather olarak yazar.
+    Karışık tipli object sütunlar (ör. Family: str + int) metne çevrilir.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    table = pa.Table.from_pandas(arrow_safe_frame(dfn), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"grlsz.source": digest.encode("utf-8"),
+        b"grlsz.columns": json.dumps([column_label(c) for c in dfn.columns]).encode("utf-8"),
+        b"grlsz.n_raw": str(n_raw).encode("utf-8"),
+        b"grlsz.sheet": json.dumps(sheet).encode("utf-8"),
+    })
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    feather.write_feather(table, tmp, compression="uncompressed")
+    os.replace(tmp, path)  # readers never see a half-written snapshot
+    return path
+
+def read_snapshot(path, digest: str):
+    """Snapshot güncelse (raw, sheet, dfn) döner; yoksa / eskiyse / okunamazsa None."""
     try:
-        bio.seek(0)
-        return pd.read_excel(bio, sheet_name="Data")
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
     except Exception:
-        bio.seek(0)
-        return pd.read_csv(bio)
+        return None
+    meta = table.schema.metadata or {}
+    if meta.get(b"grlsz.source", b"").decode("utf-8") != digest:
+        return None  # stale: not counted, the workbook is read instead
+    dfn = table.to_pandas()
+    dfn.columns = json.loads(meta[b"grlsz.columns"])
+    n_raw = int(meta[b"grlsz.n_raw"])
+    count_load("snapshot_reads")
+    return dfn.iloc[:, :n_raw], json.loads(meta[b"grlsz.sheet"]), dfn
+
+def compile_snapshot(path, force: bool = False) -> Path:
+    """Workbook'tan snapshot üretir (güncel snapshot varsa force olmadan dokunmaz)."""
+    p = Path(path)
+    out = snapshot_path(p)
+    rules = load_rules()
+    digest = workbook_digest(p, rules)
+    if not force and read_snapshot(out, digest) is not None:
+        return out
+    df_raw, sheet = read_data_sheet(p)
+    df_raw = prepare_raw(df_raw)
+    return write_snapshot(out, build_normalized_view(df_raw, rules), len(df_raw.columns), sheet, digest)
+
+def read_workbook_cached(path, rules: RuleSet = None):
+    """Güncel snapshot varsa onu okur; yoksa workbook'u okuyup snapshot'ı yeniler."""
+    p = Path(path)
+    rules = rules or load_rules()
+    digest = workbook_digest(p, rules)
+    snap = read_snapshot(snapshot_path(p), digest)
+    if snap is not None:
+        return snap
+    df_raw, sheet = read_data_sheet(p)
+    df_raw = prepare_raw(df_raw)
+    dfn = build_normalized_view(df_raw, rules)
+    try:
+        write_snapshot(snapshot_path(p), dfn, len(df_raw.columns), sheet, digest)
+    except (ImportError, OSError) as e:  # pyarrow missing / read-only folder: keep serving from memory
+        log.warning("snapshot not written for %s: %s", p.name, e)
+    return df_raw, sheet, dfn
+
+# -----------------------------
+# Catalog cache (process-wide, shared by all sessions)
+# -----------------------------
+@dataclass
+class Catalog:
+    raw: pd.DataFrame
+    norm: pd.DataFrame
+    index: FilterIndex
+    out_cols: list
+    sheet: str | None
+    version: str
+    answers: AnswerTable = None
+    load_stats: dict = field(default_factory=dict)  # workbook_opens, snapshot_reads, seconds
+    scorer: Scorer = None
+    origin: str = ""  # fingerprint of the loaded source; deltas are published under it
+    search_index: SearchIndex = None
+    similarity: SimilarityIndex = None
+    spec_index: SpecIndex = None
+    rules: RuleSet = None  # the rules norm was built with; deltas normalize with the same ones
+    frame_nbytes: int = None  # catalog_nbytes: deep size of raw + derived columns, measured once
+    on_index_built: object = None  # callback(cat) after a lazy index is built; CatalogRegistry re-checks its cap
+
+    def _index_built(self):
+        if self.on_index_built is not None:
+            self.on_index_built(self)
+
+    def ensure_answers(self) -> AnswerTable:
+        if self.answers is None:
+            self.answers = AnswerTable(self.index)
+            self._index_built()
+        return self.answers
+
+    def ensure_scorer(self) -> Scorer:
+        if self.scorer is None:
+            self.scorer = Scorer(self.index)
+            self._index_built()
+        return self.scorer
+
+    def ensure_specs(self) -> SpecIndex:
+        if self.spec_index is None:
+            with timed_stage("spec_index", rows_in=len(self.norm)):
+                self.spec_index = SpecIndex(self.norm)
+            self._index_built()
+        return self.spec_index
+
+    def ensure_search(self) -> SearchIndex:
+        if self.search_index is None:
+            with timed_stage("search_index", rows_in=len(self.raw)):
+                cols = []
+                for letter in SEARCH_LETTERS:
+                    try:
+                        cols.append(excel_letter_to_name(self.raw.columns, letter))
+                    except IndexError:
+                        pass
+                self.search_index = SearchIndex(self.raw, cols)
+            self._index_built()
+        return self.search_index
+
+    def ensure_similarity(self) -> SimilarityIndex:
+        if self.similarity is None:
+            def col(letter):
+                try:
+                    return excel_letter_to_name(self.raw.columns, letter)
+                except IndexError:
+                    return None
+            numeric = [c for c in SIMILAR_NUMERIC if c in self.norm.columns]
+            categorical = [c if c in self.norm.columns else col(c) for c in SIMILAR_CATEGORICAL]
+            with timed_stage("similar_index", rows_in=len(self.norm)):
+                self.similarity = SimilarityIndex(self.norm, numeric, [c for c in categorical if c is not None],
+                                                  group=col(SIMILAR_GROUP_LETTER), gender="q1",
+                                                  label=col(DELTA_KEY_LETTER))
+            self._index_built()
+        return self.similarity
+
+    def similar(self, position: int, k: int = 10) -> pd.DataFrame:
+        """position satırına en benzer k ürün; 'Mesafe' özellik uzaklığıdır (küçük = daha benzer)."""
+        with timed_stage("similar", rows_in=len(self.norm)) as rec:
+            pos, dist = self.ensure_similarity().query([position], k)
+            keep = pos[0] >= 0
+            rec["rows_out"] = int(keep.sum())
+        found = self.norm.take(pos[0][keep])
+        found.insert(0, "Mesafe", np.round(dist[0][keep].astype(float), 2))
+        return found
+
+    def similar_table(self, k: int = 5, sku_col: str = None, positions=None) -> pd.DataFrame:
+        """Toplu sorgu: her satır (varsayılan tüm katalog) için k komşu; uzun tablo (sku, rank, similar_sku, distance)."""
+        sku_col = sku_col or excel_letter_to_name(self.raw.columns, DELTA_KEY_LETTER)
+        positions = np.arange(len(self.norm)) if positions is None else np.asarray(positions)
+        index = self.ensure_similarity()
+        with timed_stage("similar_batch", rows_in=len(positions)) as rec:
+            pos, dist = index.query(positions, k)
+            src = np.repeat(positions, pos.shape[1])
+            rank = np.tile(np.arange(1, pos.shape[1] + 1), len(positions))
+            keep = pos.ravel() >= 0
+            skus = index.labels if sku_col == index.label else self.norm[sku_col].astype(str).to_numpy(dtype=object)
+            table = pd.DataFrame({
+                "sku": skus[src[keep]],
+                "rank": rank[keep],
+                "similar_sku": skus[pos.ravel()[keep]],
+                "distance": np.round(dist.ravel()[keep].astype(float), 4),
+            })
+            rec["rows_out"] = len(table)
+        return table
+
+    def search(self, query: str, k: int = 50) -> pd.DataFrame:
+        """Serbest metin model araması; 'Eşleşme' sütunu sorgu kelimelerine göre yüzde skordur."""
+        with timed_stage("search", rows_in=len(self.norm)) as rec:
+            pos, scores, _ = self.ensure_search().search(query, k)
+            rec["rows_out"] = len(pos)
+        found = self.norm.take(pos)
+        n_words = max(1, len(set(search_tokens(query))))
+        found.insert(0, "Eşleşme", np.round(100 * scores / n_words).astype(int))
+        return found
+
+    def rank(self, params: dict, k: int = 20) -> pd.DataFrame:
+        """Ağırlıklı skora göre en iyi k satır; 'Uyum' sütunu sağlanan ağırlık yüzdesidir."""
+        with timed_stage("rank", rows_in=len(self.norm)) as rec:
+            active = range_params(params)
+            allowed = self.ensure_specs().mask(active) if active else None
+            pos, scores, max_score = self.ensure_scorer().top_k(params, k, allowed)
+            rec["rows_out"] = len(pos)
+        ranked = self.norm.take(pos)
+        ranked.insert(0, "Uyum", np.round(100 * scores / max_score).astype(int) if max_score else 100)
+        return ranked
+
+    def query(self, params: dict) -> pd.DataFrame:
+        """apply_filters'ın en hızlı yolu: önceden hesaplanmış tablo, yoksa bitmap index."""
+        return self.norm.take(self.positions(params))
+
+    def positions(self, params: dict) -> np.ndarray:
+        ranges = self.ensure_specs() if range_params(params) else None
+        return filter_positions(self.norm, params, index=self.answers if self.answers is not None else self.index,
+                                ranges=ranges)
+
+def file_fingerprint(path, rules: RuleSet = None) -> str:
+    p = Path(path)
+    stat = p.stat()
+    return f"file:{p.resolve()}:{stat.st_mtime_ns}:{stat.st_size}:rules={(rules or load_rules()).digest}"
+
+def bytes_fingerprint(data: bytes, name: str = "", rules: RuleSet = None) -> str:
+    return f"bytes:{name}:{hashlib.sha1(data).hexdigest()}:rules={(rules or load_rules()).digest}"
+
+def read_data_sheet(src, sheet_names=("Data",)):
+    """
+    Data sayfasını (DATA, data, ... — match_sheet_name) workbook'u bir kez açarak okur;
+    (DataFrame, sayfa adı) döner.
+    """
+    try:
+        return read_xlsx_sheet(src, sheet_names)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        # not an .xlsx (e.g. .xls) or an unusual package layout -> pandas/openpyxl
+        if hasattr(src, "seek"):
+            src.seek(0)
+    with pd.ExcelFile(src) as xf:
+        name = match_sheet_name(xf.sheet_names, sheet_names)
+        if name is None:
+            raise ValueError(f"Worksheet named {sheet_names[0]!r} not found (sheets: {', '.join(xf.sheet_names)})")
+        df = xf.parse(name)
+    count_load("workbook_opens")
+    return df, name
+
+def _build_catalog(fingerprint: str, read, rules: RuleSet) -> Catalog:
+    # `read` returns (df_raw, sheet, dfn or None); `rules` are the ones whose digest is in the fingerprint.
+    t0 = time.perf_counter()
+    _load_local.counts = counts = Counter()
+    try:
+        with timed_stage("parse") as rec:
+            df_raw, sheet, dfn = read()
+            rec["rows_out"] = len(df_raw)
+            rec["cache"] = "snapshot" if dfn is not None else "workbook"
+    finally:
+        _load_local.counts = None
+    if dfn is None:
+        df_raw = prepare_raw(df_raw)
+        dfn = build_normalized_view(df_raw, rules)
+    cat = Catalog(
+        raw=df_raw,
+        norm=dfn,
+        index=FilterIndex(dfn),
+        out_cols=resolve_output_columns(df_raw),
+        sheet=sheet,
+        version=hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12],
+        origin=fingerprint,
+        rules=rules,
+    )
+    cat.load_stats = {**counts, "seconds": round(time.perf_counter() - t0, 3)}
+    return cat
+
+@st.cache_resource(show_spinner=False, max_entries=CATALOG_CACHE_ENTRIES)
+def _cached_catalog(fingerprint: str, _read, _rules: RuleSet) -> Catalog:
+    # Keyed on the fingerprint only (it carries the rules digest); `_read` / `_rules` are not hashed by Streamlit.
+    return _build_catalog(fingerprint, _read, _rules)
+
+def catalog_source(source, ttl: float = None, max_bytes: int = None, progress=None, use_snapshot: bool = True):
+    """
+    Yol ya da http(s) URL -> (fingerprint, read, rules); read() -> (df_raw, sheet, dfn or None).
+    Kurallar bir kez okunur: fingerprint'teki digest ile normalize eden kurallar aynıdır.
+    """
+    rules = load_rules()
+    if str(source).startswith(("http://", "https://")):
+        # Same digest after a 304 / unchanged body -> same fingerprint, no re-parse
+        entry = fetch_remote(str(source), ttl=ttl, max_bytes=max_bytes, progress=progress)
+        return f"bytes:{source}:{entry.digest}:rules={rules.digest}", lambda: (read_remote(entry), None, None), rules
+    p = Path(source)
+    if use_snapshot:
+        return file_fingerprint(p, rules), lambda: read_workbook_cached(p, rules), rules
+    return file_fingerprint(p, rules), lambda: (*read_data_sheet(p), None), rules
+
+def catalog_from_path(path, use_snapshot: bool = True) -> Catalog:
+    return _cached_catalog(*catalog_source(Path(path), use_snapshot=use_snapshot))
+
+def catalog_from_bytes(data: bytes, name: str = "") -> Catalog:
+    rules = load_rules()
+    read = lambda: (*read_data_sheet(io.BytesIO(data)), None)
+    return _cached_catalog(bytes_fingerprint(data, name, rules), read, rules)
+
+def catalog_from_url(url: str, ttl: float = None, max_bytes: int = None, progress=None) -> Catalog:
+    return _cached_catalog(*catalog_source(url, ttl=ttl, max_bytes=max_bytes, progress=progress))
+
+# -----------------------------
+# Delta updates (upsert / delete by SKU, copy-on-write)
+# -----------------------------
+DELTA_KEY_LETTER = "H"  # MR: SKU / colour code (e.g. FD8311.600)
+
+def cast_like(values: pd.Series, dtype, name) -> pd.Series:
+    """Delta değerlerini katalog sütununun tipine çevirir (metin sütunlarında prepare_raw gibi str); olmazsa ValueError."""
+    values = values.astype(object)
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype):
+        text = values.where(values.isna(), values.astype(str))
+        return text if isinstance(dtype, pd.CategoricalDtype) or dtype == object else text.astype(dtype)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        out = pd.to_datetime(values, errors="coerce")
+    elif pd.api.types.is_bool_dtype(dtype):
+        out = values.map({True: True, False: False, "true": True, "false": False}, na_action="ignore")
+    elif pd.api.types.is_numeric_dtype(dtype):
+        out = pd.to_numeric(values.where(~values.map(lambda v: isinstance(v, bool))), errors="coerce")
+    else:
+        try:
+            return values.astype(dtype)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}") from None
+    bad = out.isna() & values.notna()
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        bad |= out.isna()  # no missing values in an int / bool column
+        if pd.api.types.is_integer_dtype(dtype):
+            bad |= out.notna() & (out.fillna(0) % 1 != 0)
+    if bad.any():
+        raise ValueError(f"{name}: not {dtype}: {', '.join(map(repr, values[bad].head(5)))}")
+    return out.astype(dtype)
+
+def apply_delta(base: Catalog, upserts=None, deletes=(), key: str = None) -> Catalog:
+    """
+    SKU sütununa (varsayılan H = MR) göre satır ekler/günceller ve siler; yeni bir Catalog döner.
+
+    - upserts: DataFrame ya da satır sözlükleri listesi (anahtarlar katalog sütun adları). Var olan
+      SKU'da verilmeyen alanlar (DataFrame'de olmayan sütun, sözlükte olmayan anahtar) eski satırdan
+      gelir; yeni SKU'nun her sütunu vermesi gerekir. Değerler katalog sütunlarının tipine çevrilir.
+    - Bilinmeyen sütun, çevrilemeyen değer ya da hem upsert hem delete edilen SKU -> ValueError.
+    - Yalnızca upsert satırları normalize edilir; index bitset'leri delta satırlarıyla yamalanır.
+    - Var olan SKU yerinde güncellenir (aynı SKU'nun diğer kopyaları düşer), yeni SKU sona eklenir.
+    - base değiştirilmez. Yayınlamak katalogun sahibinin işidir (CatalogRegistry.apply_delta,
+      api_grlsz POST /delta): okuyucular tek referans değişimiyle eski ya da yeni sürümü görür.
+    """
+    key = key or excel_letter_to_name(base.raw.columns, DELTA_KEY_LETTER)
+    columns = list(base.raw.columns)
+    if upserts is None:
+        upserts = base.raw.iloc[:0]
+    if isinstance(upserts, pd.DataFrame):
+        frame = upserts.reset_index(drop=True)
+        given = np.broadcast_to(np.array([c in frame.columns for c in columns], dtype=bool), (len(frame), len(columns)))
+    else:
+        frame = pd.DataFrame.from_records(list(upserts), columns=list(dict.fromkeys(c for r in upserts for c in r)))
+        given = np.array([[c in r for c in columns] for r in upserts], dtype=bool).reshape(len(frame), len(columns))
+    unknown = [c for c in frame.columns if c not in columns]
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(map(str, unknown))}")
+    if len(frame) and (key not in frame.columns or frame[key].isna().any() or not given[:, columns.index(key)].all()):
+        raise ValueError(f"every upsert needs {key}")
+    up_keys = frame[key].astype(str) if len(frame) else pd.Series([], dtype=object)
+    both = sorted(set(up_keys) & {str(d) for d in deletes})
+    if both:
+        raise ValueError(f"SKUs both upserted and deleted: {', '.join(both)}")
+    last = ~up_keys.duplicated(keep="last").to_numpy()
+    frame, given, up_keys = frame[last].reset_index(drop=True), given[last], up_keys[last].reset_index(drop=True)
+
+    # one factorize over all keys, then integer set ops (string isin is slow on arrow-backed columns)
+    n_base, n_up = len(base.raw), len(frame)
+    codes, _ = pd.factorize(np.concatenate([
+        base.raw[key].astype(str).to_numpy(dtype=object),
+        up_keys.to_numpy(dtype=object),
+        np.array([str(d) for d in deletes], dtype=object),
+    ]))
+    base_codes, up_codes, del_codes = codes[:n_base], codes[n_base:n_base + n_up], codes[n_base + n_up:]
+    first_of_code = np.full(codes.max(initial=-1) + 1, -1)
+    uniq, first_pos = np.unique(base_codes, return_index=True)
+    first_of_code[uniq] = first_pos
+    existing = first_of_code[up_codes]  # base row the upsert replaces, -1 = new SKU
+    partial_new = (existing < 0) & ~given.all(axis=1)
+    if partial_new.any():
+        raise ValueError(f"new SKUs need every column: {', '.join(up_keys[partial_new].head(5))}")
+    merged = {}
+    for j, c in enumerate(columns):
+        values = frame[c].astype(object).to_numpy() if c in frame.columns else np.full(n_up, None, dtype=object)
+        fill = ~given[:, j]
+        if fill.any():  # fields the upsert leaves out keep the existing row's value
+            values = values.copy()
+            values[fill] = base.raw[c].take(existing[fill]).astype(object).to_numpy()
+        merged[c] = cast_like(pd.Series(values, dtype=object), base.raw[c].dtype, c)
+    upserts = pd.DataFrame(merged, columns=base.raw.columns)
+
+    up_of_code = np.full(codes.max(initial=-1) + 1, -1)
+    up_of_code[up_codes] = np.arange(n_up)
+    first = np.zeros(n_base, dtype=bool)
+    first[first_pos] = True
+    upserted = up_of_code[base_codes] >= 0
+    keep = ~np.isin(base_codes, del_codes) & (first | ~upserted)
+    # src[i] >= 0: row i comes from base; -1-j: row i is upserts row j
+    src = np.arange(n_base)
+    src[upserted] = -1 - up_of_code[base_codes[upserted]]
+    appended = np.flatnonzero(existing < 0)
+    src = np.concatenate([src[keep], -1 - appended])
+
+    delta_norm = build_normalized_view(upserts, base.rules)
+    def splice(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        old, new = old.copy(deep=False), new.copy(deep=False)
+        for c in old.columns:  # keep categoricals categorical: widen both sides to the union of categories
+            if isinstance(old[c].dtype, pd.CategoricalDtype):
+                cats = old[c].cat.categories.union(pd.Index(new[c].dropna().unique()))
+                old[c] = old[c].cat.set_categories(cats)
+                new[c] = new[c].astype(pd.CategoricalDtype(cats))
+        both = pd.concat([old, new], ignore_index=True)
+        return both.take(np.where(src >= 0, src, len(old) - 1 - src)).reset_index(drop=True)
+
+    # norm = raw columns + derived (q, spec) columns; only the derived columns need their own splice
+    q_cols = DERIVED_COLUMNS
+    raw = splice(base.raw, upserts)
+    nxt = Catalog(
+        raw=raw,
+        norm=pd.concat([raw, splice(base.norm[q_cols], delta_norm[q_cols])], axis=1),
+        index=base.index.spliced(src, delta_norm),
+        out_cols=base.out_cols,
+        sheet=base.sheet,
+        version=hashlib.sha1(f"{base.version}:{pd.util.hash_pandas_object(upserts).sum()}:{sorted(map(str, deletes))}".encode("utf-8")).hexdigest()[:12],
+        load_stats=base.load_stats,
+        origin=base.origin,
+        rules=base.rules,
+    )
+    if base.answers is not None:
+        nxt.ensure_answers()
+    return nxt
+
+# -----------------------------
+# Multi-store registry (store id -> catalog, LRU under a memory cap)
+# -----------------------------
+DEFAULT_REGISTRY_BYTES = 512 * 1024 * 1024
+
+def catalog_nbytes(cat: Catalog) -> int:
+    """
+    Yaklaşık bellek: ham sütunlar (norm ile paylaşılır, bir kez) + türetilmiş sütunlar + index/answers/scorer dizileri.
+    Tabloların derin ölçümü katalog başına bir kez yapılır (frame_nbytes); index dizileri her seferinde toplanır.
+    """
+    if cat.frame_nbytes is None:
+        cat.frame_nbytes = int(cat.raw.memory_usage(deep=True, index=False).sum()
+                               + cat.norm[DERIVED_COLUMNS].memory_usage(deep=True, index=False).sum())
+    total = cat.frame_nbytes
+    total += sum(b.nbytes for b in cat.index.bits.values())
+    if cat.answers is not None:
+        total += cat.answers.counts.nbytes + cat.answers.offsets.nbytes + cat.answers.rows.nbytes
+    if cat.scorer is not None:
+        total += sum(f.nbytes for f in cat.scorer.features.values())
+    if cat.spec_index is not None:
+        specs = cat.spec_index
+        total += sum(specs.by_row[c].nbytes + specs.order[c].nbytes + specs.values[c].nbytes for c in RANGE_FILTERS)
+    if cat.similarity is not None:
+        total += cat.similarity.features.nbytes + cat.similarity.sq.nbytes
+        if cat.similarity.labels is not None:
+            total += cat.norm[cat.similarity.label].memory_usage(deep=True, index=False)
+    if cat.search_index is not None:
+        si = cat.search_index
+        total += si.offsets.nbytes + si.rows.nbytes + si.gram_offsets.nbytes + si.gram_tokens.nbytes + si.vocab.nbytes
+    return int(total)
+
+class CatalogRegistry:
+    """
+    Mağaza kimliği -> katalog kaynağı (yol ya da URL). Kataloglar ilk istekte yüklenir, tüm
+    oturumlarca paylaşılır; toplam bellek max_bytes'ı aşınca en uzun süredir kullanılmayan
+    mağaza bırakılır. Kaynak değişirse (dosya mtime / URL digest) katalog yeniden yüklenir.
+    """
+
+    def __init__(self, sources: dict = None, max_bytes: int = DEFAULT_REGISTRY_BYTES, ttl: float = None):
+        self.sources = dict(sources or {})
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._resident = OrderedDict()  # store id -> Catalog, least recently used first
+        self._stats = {}  # store id -> Counter(hits, misses, evictions)
+        self._lock = threading.Lock()
+        self._store_locks = {}
+
+    def register(self, store_id: str, source):
+        self.sources[store_id] = source
+
+    def _lookup(self, store_id: str, fingerprint: str):
+        cat = self._resident.get(store_id)
+        if cat is not None and cat.origin == fingerprint:
+            self._resident.move_to_end(store_id)
+            self._stats[store_id]["hits"] += 1
+            return cat
+        return None
+
+    def get(self, store_id: str, progress=None) -> Catalog:
+        if store_id not in self.sources:
+            raise KeyError(f"Unknown store {store_id!r} (known: {', '.join(self.sources)})")
+        fingerprint, read, rules = catalog_source(self.sources[store_id], ttl=self.ttl, progress=progress)
+        with self._lock:
+            self._stats.setdefault(store_id, Counter())
+            cat = self._lookup(store_id, fingerprint)
+            if cat is not None:
+                return cat
+            store_lock = self._store_locks.setdefault(store_id, threading.Lock())
+        with store_lock:  # one load per store at a time; other stores keep serving
+            with self._lock:
+                cat = self._lookup(store_id, fingerprint)
+            if cat is not None:
+                return cat
+            cat = _build_catalog(fingerprint, read, rules)
+            with self._lock:
+                self._stats[store_id]["misses"] += 1
+                self._drop(store_id)
+                self._admit(store_id, cat)
+        return cat
+
+    def apply_delta(self, store_id: str, upserts: pd.DataFrame = None, deletes=(), key: str = None) -> Catalog:
+        """
+        Mağaza kataloğuna SKU deltası uygular (apply_delta) ve yeni sürümü yayınlar. Aynı mağazanın
+        deltaları sırayla uygulanır; okuyucular tek referans değişimiyle eski ya da yeni sürümü görür.
+        Kaynak dosya / URL değişince katalog kaynaktan yeniden kurulur (deltalar kaynağa yazılmalıdır).
+        """
+        base = self.get(store_id)
+        with self._lock:
+            store_lock = self._store_locks.setdefault(store_id, threading.Lock())
+        with store_lock:
+            with self._lock:
+                base = self._resident.get(store_id, base)  # a delta published while we waited
+            nxt = apply_delta(base, upserts, deletes, key)
+            with self._lock:
+                self._admit(store_id, nxt)
+        return nxt
+
+    def _admit(self, store_id: str, cat: Catalog):
+        # lazy indexes (search, similarity, specs, scorer) grow the catalog after get(): re-check the cap then
+        cat.on_index_built = self._index_built
+        self._resident[store_id] = cat
+        self._resident.move_to_end(store_id)
+        self._evict(keep=store_id)
+
+    def _index_built(self, cat: Catalog):
+        with self._lock:
+            for sid, resident in self._resident.items():
+                if resident is cat:
+                    self._evict(keep=sid)
+                    break
+
+    def _drop(self, store_id: str):
+        self._resident.pop(store_id, None)
+
+    def nbytes(self, store_id: str) -> int:
+        """Mağazanın bellekteki boyutu: katalog + URL kaynağıysa saklanan indirme gövdesi."""
+        cat = self._resident.get(store_id)
+        if cat is None:
+            return 0
+        source = str(self.sources.get(store_id, ""))
+        remote = remote_nbytes(source) if source.startswith(("http://", "https://")) else 0
+        return catalog_nbytes(cat) + remote
+
+    def _evict(self, keep: str):
+        sizes = {sid: self.nbytes(sid) for sid in self._resident}
+        total = sum(sizes.values())
+        for sid in list(self._resident):
+            if total <= self.max_bytes:
+                break
+            if sid == keep:
+                continue
+            self._drop(sid)
+            source = str(self.sources.get(sid, ""))
+            if source.startswith(("http://", "https://")):
+                forget_remote(source)  # the body is counted in the store's size, so it goes with it
+            self._stats[sid]["evictions"] += 1
+            total -= sizes[sid]
+
+    def stats(self) -> list:
+        """Mağaza başına: resident, bytes, rows, version, hits, misses, evictions."""
+        with self._lock:
+            rows = []
+            for sid in self.sources:
+                cat = self._resident.get(sid)
+                rows.append({
+                    "store": sid,
+                    "resident": cat is not None,
+                    "bytes": self.nbytes(sid),
+                    "rows": len(cat.norm) if cat is not None else 0,
+                    "version": cat.version if cat is not None else None,
+                    **{k: self._stats.get(sid, {}).get(k, 0) for k in ("hits", "misses", "evictions")},
+                })
+            return rows
+
+@st.cache_resource(show_spinner=False)
+def store_registry() -> CatalogRegistry:
+    """Secrets'taki [STORES] tablosundan (mağaza kimliği = yol ya da URL) süreç genelinde tek registry."""
+    stores = st.secrets.get("STORES", {}) if hasattr(st, "secrets") else {}
+    max_mb = float(st.secrets.get("STORES_MAX_MB", DEFAULT_REGISTRY_BYTES // (1024 * 1024))) if stores else 0
+    ttl = float(st.secrets.get("DATA_URL_TTL", DEFAULT_FETCH_TTL)) if stores else None
+    return CatalogRegistry({str(k): str(v) for k, v in stores.items()}, max_bytes=int(max_mb * 1024 * 1024), ttl=ttl)
+
+def describe_load(cat: Catalog) -> str:
+    stats = cat.load_stats
+    parts = [f"{stats.get('workbook_opens', 0)} workbook açılışı"]
+    if stats.get("snapshot_reads"):
+        parts.append("snapshot")
+    parts.append(f"{stats.get('seconds', 0):.2f} sn")
+    return "Katalog yüklemesi: " + ", ".join(parts)
+
+def download_progress(placeholder):
+    """st.empty() yer tutucusunda indirme ilerlemesini gösteren progress callback'i."""
+    def report(done, total):
+        if total:
+            placeholder.progress(min(done / total, 1.0), text=f"İndiriliyor... {done // 1024} / {total // 1024} KB")
+        else:
+            placeholder.caption(f"İndiriliyor... {done // 1024} KB")
+    return report
 
 # -----------------------------
 # Main loader with secrets support
 # -----------------------------
-def load_df(preferred_names=None):
+def load_catalog(preferred_names=None, precompute_answers=False):
+    """
+    load_df ile aynı kaynak sırası; (Catalog, kaynak etiketi) döner.
+    precompute_answers=True ise tüm cevap kombinasyonları (AnswerTable) yüklemede hesaplanır.
+    """
+    return load_catalog_with(lambda: _locate_catalog(preferred_names), precompute_answers)
+
+def load_catalog_with(locate, precompute_answers=False):
+    """
+    Uygulamanın kendi kaynak seçimi için yükleme çerçevesi: locate() -> (Catalog ya da None, kaynak etiketi).
+    Her çalıştırmada aşama süreleri sıfırlanır, metrics sunucusu (METRICS_PORT) başlatılır, kural dosyası
+    hatası uyarı olarak gösterilir ve debug panelinde load / fetch / parse süreleri görünür.
+    """
+    _stage_local.events = []
+    _stage_local.panel = st.sidebar.empty() if debug_enabled() else None
+    port = os.environ.get("GRLSZ_METRICS_PORT") or st.secrets.get("METRICS_PORT", "")
+    if str(port).isdigit():
+        start_metrics_server(int(port))
+    with timed_stage("load_catalog") as rec:
+        cat, source_label = locate()
+        if cat is not None:
+            if rules_error():
+                st.warning(f"Kural dosyası kullanılamıyor, son geçerli kurallarla devam ediliyor ({cat.rules.digest if cat.rules else '?'}): {rules_error()}")
+            if precompute_answers:
+                cat.ensure_answers()
+            rec["rows_out"] = len(cat.norm)
+        rec["cache"] = "miss" if any(e["stage"] == "parse" for e in _stage_local.events) else "hit"
+    render_timing_panel()
+    return cat, source_label
+
+def _locate_catalog(preferred_names=None):
     if preferred_names is None:
         preferred_names = ["Kod _n_ son grlsz.xlsx", "Kod _n_ son.xlsx", "Kod Önü son.xlsx", "data.xlsx"]
 
+    # 0) Secrets: STORES (one catalog per store; ?store=<id> or sidebar choice)
+    registry = store_registry()
+    if registry.sources:
+        store_ids = list(registry.sources)
+        wanted = st.query_params.get("store")
+        store_id = wanted if wanted in registry.sources else st.sidebar.selectbox("Mağaza", store_ids)
+        try:
+            bar = st.empty()
+            cat = registry.get(store_id, progress=download_progress(bar))
+            bar.empty()
+            with st.sidebar.expander("Mağaza katalogları (bellek / hit / miss)"):
+                st.dataframe(pd.DataFrame(registry.stats()), hide_index=True)
+            return cat, f"Mağaza: {store_id} ({cat.sheet or 'URL'})"
+        except Exception as e:
+            st.error(f"Mağaza kataloğu yüklenemedi ({store_id}): {e}")
+            st.stop()
+
     # 1) Secrets: DATA_URL (forces no uploader)
     if hasattr(st, "secrets"):
         url = st.secrets.get("DATA_URL", "").strip()
         if url:
             try:
-                df_raw = load_from_url(url)
-                return df_raw, "Secrets: DATA_URL"
+                ttl = float(st.secrets.get("DATA_URL_TTL", DEFAULT_FETCH_TTL))
+                max_bytes = int(st.secrets.get("DATA_URL_MAX_BYTES", DEFAULT_MAX_BYTES))
+                bar = st.empty()
+                cat = catalog_from_url(url, ttl=ttl, max_bytes=max_bytes, progress=download_progress(bar))
+                bar.empty()
+                return cat, "Secrets: DATA_URL"
             except Exception as e:
                 st.error(f"DATA_URL indirilemedi: {e}")
 
@@ -228,12 +2044,8 @@ def load_df(preferred_names=None):
                 # try relative to repo root
                 p = Path(".") / data_file
             if p.exists():
-                try:
-                    df_raw = pd.read_excel(p, sheet_name="Data")
-                    return df_raw, f"Secrets: DATA_FILE ({p.name}) (Data)"
-                except Exception:
-                    df_raw = pd.read_excel(p, sheet_name="DATA")
-                    return df_raw, f"Secrets: DATA_FILE ({p.name}) (DATA)"
+                cat = catalog_from_path(p)
+                return cat, f"Secrets: DATA_FILE ({p.name}) ({cat.sheet})"
             else:
                 st.error(f"DATA_FILE bulunamadı: {data_file}")
 
@@ -241,23 +2053,368 @@ def load_df(preferred_names=None):
     candidates = [Path(name) for name in preferred_names] + [Path("/mnt/data") / name for name in preferred_names]
     data_path = next((p for p in candidates if p.exists()), None)
     if data_path is not None:
-        try:
-            df_raw = pd.read_excel(data_path, sheet_name="Data")
-            return df_raw, f"Yerel: {data_path.name} (Data)"
-        except Exception:
-            df_raw = pd.read_excel(data_path, sheet_name="DATA")
-            return df_raw, f"Yerel: {data_path.name} (DATA)"
+        cat = catalog_from_path(data_path)
+        return cat, f"Yerel: {data_path.name} ({cat.sheet})"
 
     # 4) Fallback: file uploader
     uploaded = st.file_uploader("Excel yükle (.xlsx) — Data/DATA sayfası olmalı", type=["xlsx"])
     if uploaded is not None:
-        try:
-            df_raw = pd.read_excel(uploaded, sheet_name="Data")
-            return df_raw, "Yüklenen dosya (Data)"
-        except Exception:
-            uploaded.seek(0)
-            df_raw = pd.read_excel(uploaded, sheet_name="DATA")
-            return df_raw, "Yüklenen dosya (DATA)"
+        cat = catalog_from_bytes(uploaded.getvalue(), uploaded.name)
+        return cat, f"Yüklenen dosya ({cat.sheet})"
 
     st.info("Aynı klasöre 'Kod _n_ son grlsz.xlsx' koyun, ya da Secrets -> DATA_URL / DATA_FILE ayarlayın, ya da Excel yükleyin.")
     st.stop()
+
+def load_df(preferred_names=None):
+    cat, source_label = load_catalog(preferred_names)
+    return cat.raw, source_label
+
+# -----------------------------
+# Export
+# -----------------------------
+def to_csv_bytes(frame: pd.DataFrame, cols) -> bytes:
+    with timed_stage("export_csv", rows_in=len(frame)) as rec:
+        data = frame[cols].to_csv(index=False).encode("utf-8")
+        rec["rows_out"], rec["nbytes"] = len(frame), len(data)
+    return data
+
+def to_xlsx_bytes(frame: pd.DataFrame, cols) -> bytes:
+    """openpyxl write-only (satırlar akış halinde yazılır); sayfa adı 'Data', yani tekrar içe aktarılabilir."""
+    import openpyxl
+    with timed_stage("export_xlsx", rows_in=len(frame)) as rec:
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Data")
+        ws.append([str(c) for c in cols])
+        sub = frame[cols].astype(object)
+        for row in sub.where(sub.notna(), None).itertuples(index=False):
+            ws.append(row)
+        buf = io.BytesIO()
+        wb.save(buf)
+        data = buf.getvalue()
+        rec["rows_out"], rec["nbytes"] = len(frame), len(data)
+    return data
+
+def to_parquet_bytes(frame: pd.DataFrame, cols) -> bytes:
+    with timed_stage("export_parquet", rows_in=len(frame)) as rec:
+        buf = io.BytesIO()
+        arrow_safe_frame(frame[cols]).to_parquet(buf, index=False)
+        data = buf.getvalue()
+        rec["rows_out"], rec["nbytes"] = len(frame), len(data)
+    return data
+
+# format -> (button label, encoder, mime, file suffix)
+EXPORT_FORMATS = {
+    "csv": ("CSV indir", to_csv_bytes, "text/csv", ".csv"),
+    "xlsx": ("XLSX indir", to_xlsx_bytes, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "parquet": ("Parquet indir", to_parquet_bytes, "application/vnd.apache.parquet", ".parquet"),
+}
+EXPORT_CACHE_BYTES = 64 * 1024 * 1024
+
+class ExportCache:
+    """(katalog sürümü, cevaplar, format, sütunlar) -> kodlanmış dosya; toplam boyut sınırlı LRU."""
+
+    def __init__(self, max_bytes: int = EXPORT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build) -> bytes:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                return data
+        data = build()  # outside the lock; a concurrent duplicate build is harmless
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = data
+                self._size += len(data)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old)
+        return data
+
+EXPORTS = ExportCache()
+
+def export_bytes(key, fmt: str, frame: pd.DataFrame, cols) -> bytes:
+    """key: katalog sürümü + cevap kombinasyonu; aynı sonuç ikinci kez kodlanmaz."""
+    encoder = EXPORT_FORMATS[fmt][1]
+    hit = True
+
+    def build():
+        nonlocal hit
+        hit = False
+        return encoder(frame, cols)
+
+    data = EXPORTS.get((*key, fmt, tuple(map(str, cols))), build)
+    METRICS.observe("export_cache", 0.0, cache="hit" if hit else "miss")
+    return data
+
+def render_downloads(key, get_frame, cols, file_stem: str = "intersport_running_footwear"):
+    """
+    Her format için bir indirme düğmesi; dosya yalnızca düğmeye basılınca (ve önbellekte yoksa)
+    üretilir. get_frame() tam sonuç tablosunu döner; o da yalnızca bu durumda çağrılır.
+    """
+    for col, (fmt, (label, _, mime, suffix)) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        with col:
+            st.download_button(label, data=lambda fmt=fmt: export_bytes(key, fmt, get_frame(), cols),
+                               file_name=file_stem + suffix, mime=mime, on_click="ignore")
+
+# -----------------------------
+# Server-side result paging
+# -----------------------------
+PAGE_SIZES = (25, 50, 100, 250)
+
+def result_window(base: pd.DataFrame, positions: np.ndarray, cols, sort_by=None, descending: bool = False,
+                  page: int = 1, page_size: int = 50) -> pd.DataFrame:
+    """
+    base'in positions satırlarından yalnızca istenen sayfayı ve sütunları kurar.
+    Sıralama sadece sort_by sütunu üzerinde yapılır (kararlı, boşlar sonda); tablo kopyalanmaz.
+    """
+    if sort_by is not None:
+        keys = base[sort_by].take(positions).reset_index(drop=True)
+        order = keys.sort_values(ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    start = (page - 1) * page_size
+    return base.iloc[positions[start:start + page_size]][list(cols)]
+
+# -----------------------------
+# Debug timing panel
+# -----------------------------
+def debug_enabled() -> bool:
+    """?debug=1, GRLSZ_DEBUG ortam değişkeni ya da secrets DEBUG_TIMINGS = true."""
+    if os.environ.get("GRLSZ_DEBUG"):
+        return True
+    if st.query_params.get("debug") in ("1", "true"):
+        return True
+    return bool(st.secrets.get("DEBUG_TIMINGS", False))
+
+def render_timing_panel():
+    """Bu çalıştırmanın aşama sürelerini kenar çubuğundaki yer tutucuya (yeniden) çizer."""
+    panel = getattr(_stage_local, "panel", None)
+    events = getattr(_stage_local, "events", None)
+    if panel is None or events is None:
+        return
+    rows = [{"aşama": e["stage"], "ms": round(e["seconds"] * 1000, 2), "satır giriş": e["rows_in"],
+             "satır çıkış": e["rows_out"], "cache": e["cache"], "byte": e["nbytes"]} for e in events]
+    with panel.container():
+        with st.expander("Aşama süreleri (debug)", expanded=False):
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+            st.caption("load_catalog; fetch / parse / normalize aşamalarını içerir.")
+
+# -----------------------------
+# Shared wizard UI (all app variants)
+# -----------------------------
+# (state key, answer param, question label, default option index)
+WIZARD_QUESTIONS = [
+    ("q1", "gender", "1) Lütfen cinsiyetinizi seçiniz.", 0),
+    ("q2", "surface", "2) Koşmayı planladığınız zemin türü nedir?", 0),
+    ("q3", "goal", "3) Koşu hedefiniz nedir?", 0),
+    ("q4", "freq", "4) Haftada kaç gün koşuyorsunuz?", 0),
+    ("q5", "distance", "5) Ortalama kaç km koşuyorsunuz? (her koşuda)", 0),
+    ("q6", "injury", "6) Daha önce diz/kalça sakatlığı yaşadınız mı?", 1),
+    ("q7", "pronation", "7) Pronasyon (İçe basma) sorunu yaşıyor musunuz?", 1),
+]
+# optional spec ranges on the last step: (RANGE_FILTERS param, label, slider step, format)
+WIZARD_RANGES = [
+    ("drop", "Taban farkı / drop (mm)", 0.5, "%.1f"),
+    ("weight", "Ağırlık (g)", 5.0, "%.0f"),
+    ("price", "Fiyat (TL)", 50.0, "%.0f"),
+]
+
+def init_wizard_state():
+    st.session_state.setdefault("step", 1)
+    for key, *_ in WIZARD_QUESTIONS:
+        st.session_state.setdefault(key, None)
+    st.session_state.setdefault("show_result", None)
+
+def next_step():
+    st.session_state.step = min(len(WIZARD_QUESTIONS), st.session_state.step + 1)
+
+def prev_step():
+    st.session_state.step = max(1, st.session_state.step - 1)
+
+def reset_wizard():
+    st.session_state.step = 1
+    for key, *_ in WIZARD_QUESTIONS:
+        st.session_state[key] = None
+    for name, *_ in WIZARD_RANGES:
+        st.session_state.pop(f"range_{name}", None)
+        st.session_state.pop(f"rng_{name}", None)
+    st.session_state.show_result = None
+
+def wizard_ranges() -> dict:
+    """Daraltılmış kaydırıcılar: {param: (lo, hi)}; tam aralıktaki uç None (kısıt yok)."""
+    return {name: s for name, *_ in WIZARD_RANGES if (s := st.session_state.get(f"range_{name}")) is not None}
+
+def render_range_filters(catalog: Catalog):
+    """Son adımda drop / ağırlık / fiyat aralıkları; sınırlar katalogdaki tipli değerlerden gelir."""
+    s = st.session_state
+    specs = catalog.ensure_specs()
+    with st.expander("Ek filtreler (opsiyonel)", expanded=bool(wizard_ranges())):
+        for name, label, step, fmt in WIZARD_RANGES:
+            bounds = specs.bounds(name)
+            if bounds is None:
+                continue
+            lo, hi = float(np.floor(bounds[0] / step) * step), float(np.ceil(bounds[1] / step) * step)
+            if lo == hi:
+                continue
+            widget = f"rng_{name}"
+            if widget not in s:  # back on the last step: restore the saved range, clipped to this catalog
+                saved = s.get(f"range_{name}") or (None, None)
+                s[widget] = tuple(float(min(max(v, lo), hi)) if v is not None else d for v, d in zip(saved, (lo, hi)))
+            a, b = st.slider(label, lo, hi, step=step, format=fmt, key=widget)
+            s[f"range_{name}"] = None if (a, b) == (lo, hi) else (None if a == lo else a, None if b == hi else b)
+
+def render_wizard(catalog: Catalog):
+    """Geçerli adımın sorusunu, gezinme düğmelerini ve canlı eşleşme sayısını çizer."""
+    s = st.session_state
+    total = len(WIZARD_QUESTIONS)
+    key, param, label, default = WIZARD_QUESTIONS[s.step - 1]
+    st.progress(s.step / total, text=f"Adım {s.step}/{total}")
+    options = list(ANSWER_OPTIONS[param])
+    s[key] = st.radio(label, options, index=options.index(s[key]) if s[key] in options else default, horizontal=True)
+    if s.step == total:
+        render_range_filters(catalog)
+    if s.step == 1:
+        st.button("İleri →", on_click=next_step)
+    else:
+        colB, colN = st.columns(2)
+        with colB: st.button("← Geri", on_click=prev_step)
+        with colN:
+            if s.step < total:
+                st.button("İleri →", on_click=next_step)
+            elif st.button("Sonucu Göster"):
+                s.show_result = True
+
+    if catalog.answers is not None:
+        answered = {p: s.get(k) for i, (k, p, _, _) in enumerate(WIZARD_QUESTIONS, start=1) if i <= s.step}
+        ranges = wizard_ranges() if s.step == total else {}
+        count = len(catalog.positions({**answered, **ranges})) if ranges else catalog.answers.count(answered)
+        st.caption(f"Şu ana kadar eşleşen ürün: {count}")
+    render_timing_panel()
+
+def wizard_params():
+    """Son adımda 'Sonucu Göster'e basıldıysa apply_filters params'ı, değilse None."""
+    s = st.session_state
+    ready = all(s.get(key) is not None for key, *_ in WIZARD_QUESTIONS)
+    if ready and s.step == len(WIZARD_QUESTIONS) and s.get("show_result"):
+        return {**{param: s[key] for key, param, _, _ in WIZARD_QUESTIONS}, **wizard_ranges()}
+    return None
+
+def _fragment_timings():
+    # Fragment reruns skip load_catalog, and the sidebar placeholder is outside the fragment
+    _stage_local.events = []
+    _stage_local.panel = st.empty() if debug_enabled() else None
+
+@st.fragment
+def render_wizard_page(catalog: Catalog, empty_message: str):
+    """
+    Sihirbaz + sonuçlar tek fragment'ta: İleri / Geri, sayfa ve sıralama tıklamaları yalnızca bu
+    bölümü yeniden çalıştırır; katalog yükleme ve kenar çubuğu tam çalıştırmada kalır.
+    """
+    _fragment_timings()
+    init_wizard_state()
+    render_wizard(catalog)
+    params = wizard_params()
+    if params is not None:
+        render_results(catalog, params, empty_message)
+        st.divider()
+        st.button("Baştan Başla", on_click=reset_wizard)
+
+@st.fragment
+def render_search(catalog: Catalog, k: int = 50):
+    """Model / marka / SKU ile arama; yazım hatalarına toleranslı. Yalnızca bu bölüm yeniden çalışır."""
+    _fragment_timings()
+    query = st.text_input("Model, marka ya da ürün kodu", key="search_q", placeholder="ör. vaporfly, adizero sl2, FD8311")
+    if query.strip():
+        found = catalog.search(query, k)
+        if len(found) == 0:
+            st.warning("Eşleşen ürün bulunamadı.")
+        else:
+            cols = ["Eşleşme"] + [c for c in catalog.out_cols if c in found.columns]
+            st.caption(f"En iyi {len(found)} sonuç (Eşleşme = sorgu kelimelerine benzerlik yüzdesi)")
+            st.dataframe(found[cols], hide_index=True, width="stretch")
+    render_timing_panel()
+
+def render_results(catalog: Catalog, params: dict, empty_message: str, fallback_k: int = 20):
+    """Tam eşleşme yoksa cinsiyet/zemin korunarak en yüksek skorlu fallback_k ürün gösterilir."""
+    try:
+        _render_results(catalog, params, empty_message, fallback_k)
+    finally:
+        render_timing_panel()
+
+def _render_results(catalog: Catalog, params: dict, empty_message: str, fallback_k: int):
+    base, positions = catalog.norm, catalog.positions(params)
+    show_cols = [c for c in catalog.out_cols if c in base.columns]
+    mode = "exact"
+
+    st.subheader("Öneriler")
+    st.caption(f"Toplam sonuç: {len(positions)}")
+
+    if len(positions) == 0:
+        st.warning(empty_message)
+        if not fallback_k:
+            return
+        base = catalog.rank(params, fallback_k)
+        if len(base) == 0:
+            return
+        positions = np.arange(len(base))
+        show_cols = ["Uyum"] + show_cols
+        mode = f"rank{fallback_k}"
+        st.info(f"Tam eşleşme yok; cevaplarınıza en yakın {len(base)} ürün (Uyum = sağlanan kriterlerin ağırlıklı yüzdesi):")
+
+    key = (catalog.version, tuple(params.get(name) for name in [*ANSWER_OPTIONS, *RANGE_FILTERS]), mode)
+    cols, window = render_result_table(key, base, positions, show_cols)
+    render_downloads(key, lambda: base.take(positions), cols)
+    render_similar(catalog, window, cols)
+
+def render_result_table(key, base: pd.DataFrame, positions: np.ndarray, cols):
+    """
+    Sütun seçimi, sıralama ve sayfa boyutu sunucuda uygulanır; tarayıcıya yalnızca görünen
+    sayfa gider. (seçilen sütunlar, görünen sayfa) döner; indirmeler sütunları kullanır.
+    """
+    s = st.session_state
+    if s.get("res_key") != key:  # new result set -> back to the first page
+        s["res_key"] = key
+        s["res_page"] = 1
+    c_cols, c_sort, c_desc, c_size = st.columns([4, 2, 1, 1])
+    with c_cols:
+        shown = st.multiselect("Sütunlar", cols, default=cols, key=f"res_cols_{len(cols)}") or cols
+    with c_sort:
+        sort_by = st.selectbox("Sırala", ["Katalog sırası", *shown], key="res_sort")
+    with c_desc:
+        descending = st.toggle("Azalan", key="res_desc")
+    with c_size:
+        page_size = st.selectbox("Sayfa boyutu", PAGE_SIZES, index=1, key="res_size")
+
+    total = len(positions)
+    n_pages = max(1, -(-total // page_size))
+    s["res_page"] = min(max(1, s.get("res_page", 1)), n_pages)
+    window = result_window(base, positions, shown, None if sort_by == "Katalog sırası" else sort_by,
+                           descending, s["res_page"], page_size)
+    st.dataframe(window, width="stretch")
+    c_page, c_info = st.columns([1, 3])
+    with c_page:
+        st.number_input("Sayfa", min_value=1, max_value=n_pages, step=1, key="res_page")
+    with c_info:
+        start = (s["res_page"] - 1) * page_size
+        st.caption(f"{start + 1}–{start + len(window)} / {total} satır · sayfa {s['res_page']}/{n_pages}")
+    return shown, window
+
+def render_similar(catalog: Catalog, window: pd.DataFrame, cols, k: int = 10):
+    """Görünen sayfadan seçilen ürüne en benzer k ürün (farklı model, aynı cinsiyet)."""
+    positions = catalog.norm.index.get_indexer(window.index)
+    positions = positions[positions >= 0]
+    name_cols = [c for c in catalog.out_cols[:4] if c in catalog.norm.columns]  # Brand, Gender, ModelName, MR
+    text = catalog.norm.take(positions)[name_cols].astype(str).agg(" · ".join, axis=1)
+    names = dict(zip(positions.tolist(), text))
+    with st.expander("Benzer ürünler"):
+        picked = st.selectbox("Ürün", list(names), index=None, format_func=names.get,
+                              placeholder="Bu sayfadan bir ürün seçin", key="similar_pick")
+        if picked is not None:
+            found = catalog.similar(picked, k)
+            show = ["Mesafe"] + [c for c in cols if c in found.columns]
+            st.dataframe(found[show], hide_index=True, width="stretch")
+            st.caption("Mesafe: taban farkı, fiyat, ağırlık, yastıklama, karbon plaka, pronasyon, kategori ve mesafe grubuna göre (küçük = daha benzer).")
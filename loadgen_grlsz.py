@@ -0,0 +1,81 @@
+"""
+api_grlsz.py için yük üreteci: rastgele cevap kombinasyonlarıyla /recommend çağırır.
+
+    python loadgen_grlsz.py [--base http://127.0.0.1:8502] [--threads 8] [--seconds 10]
+
+Çıktı: istek/sn, p50 / p95 / p99 / max gecikme, hata sayısı. --threads varsayılanı servisin worker
+sayısıdır; fazlası sunucuda sırada bekler. Bu bekleme yeni bağlantının ilk isteğine yansır:
+connections / connect_waits (ilk yanıtı CONNECT_WAIT_MS'den geç gelen bağlantı) / connect_max_ms.
+"""
+import argparse, http.client, itertools, json, random, threading, time
+from urllib.parse import urlsplit
+import numpy as np
+from helpers_grlsz import ANSWER_OPTIONS
+from api_grlsz import DEFAULT_WORKERS
+
+COMBINATIONS = [dict(zip(ANSWER_OPTIONS, combo)) for combo in itertools.product(*ANSWER_OPTIONS.values())]
+CONNECT_WAIT_MS = 100  # first response on a new connection slower than this = waited for a worker
+
+def worker(base, deadline, latencies, firsts, errors, seed):
+    rng = random.Random(seed)
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    while time.perf_counter() < deadline:
+        body = json.dumps(rng.choice(COMBINATIONS)).encode("utf-8")
+        fresh = conn.sock is None  # first request, or the server closed the previous connection
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", "/recommend", body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(resp.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - t0)
+        if fresh:
+            firsts.append(latencies[-1])
+    conn.close()
+
+def run(base: str, threads: int, seconds: float) -> dict:
+    per_thread = [[] for _ in range(threads)]
+    firsts = [[] for _ in range(threads)]
+    errors = []
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(base, deadline, per_thread[i], firsts[i], errors, i))
+            for i in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.array(list(itertools.chain.from_iterable(per_thread))) * 1000
+    first = np.array(list(itertools.chain.from_iterable(firsts))) * 1000
+    return {
+        "requests": int(lat.size),
+        "errors": len(errors),
+        "rps": round(lat.size / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3) if lat.size else None,
+        "p95_ms": round(float(np.percentile(lat, 95)), 3) if lat.size else None,
+        "p99_ms": round(float(np.percentile(lat, 99)), 3) if lat.size else None,
+        "max_ms": round(float(lat.max()), 3) if lat.size else None,
+        "connections": int(first.size),
+        "connect_waits": int((first > CONNECT_WAIT_MS).sum()),
+        "connect_max_ms": round(float(first.max()), 3) if first.size else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://127.0.0.1:8502")
+    ap.add_argument("--threads", type=int, default=DEFAULT_WORKERS, help="varsayılan: servisin worker sayısı")
+    ap.add_argument("--seconds", type=float, default=10)
+    args = ap.parse_args()
+    print(json.dumps(run(args.base, args.threads, args.seconds)))
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,6 @@
 
 import streamlit as st
-import pandas as pd
-from pathlib import Path
-from helpers_grlsz import build_normalized_view, resolve_output_columns, apply_filters, load_df
+from helpers_grlsz import describe_load, load_catalog, render_results
 
 st.set_page_config(page_title="Intersport Running Footwear — Simple", layout="wide")
 st.title("Intersport Running Footwear")
@@ -10,11 +8,10 @@ st.title("Intersport Running Footwear")
 with st.sidebar:
     st.caption("Veri yükleyin ya da aynı klasöre 'Kod _n_ son grlsz.xlsx' koyun.")
 
-df_raw, source_label = load_df()
+catalog, source_label = load_catalog(precompute_answers=True)
 st.caption(f"Kaynak: {source_label}")
-
-dfn = build_normalized_view(df_raw)
-out_cols = resolve_output_columns(df_raw)
+with st.sidebar:
+    st.caption(describe_load(catalog))
 
 col1, col2 = st.columns(2)
 with col1:
@@ -28,14 +25,4 @@ with col2:
     q6 = st.radio("6) Diz/Kalça sakatlığı", ["Var", "Yok"], horizontal=True, index=1)
 
 params = dict(gender=q1, surface=q2, goal=q3, freq=q4, distance=q5, injury=q6, pronation=q7)
-filtered = apply_filters(dfn, params)
-show_cols = [c for c in out_cols if c in filtered.columns]
-
-st.subheader("Öneriler")
-st.caption(f"Toplam sonuç: {len(filtered)}")
-if len(filtered) == 0:
-    st.warning("Gösterilecek sonuç yok. Seçimleri değiştirip tekrar deneyin.")
-else:
-    st.dataframe(filtered[show_cols], use_container_width=True)
-    csv = filtered[show_cols].to_csv(index=False).encode("utf-8")
-    st.download_button("CSV indir", data=csv, file_name="intersport_running_footwear.csv", mime="text/csv")
+render_results(catalog, params, "Gösterilecek sonuç yok. Seçimleri değiştirip tekrar deneyin.")
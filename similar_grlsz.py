@@ -0,0 +1,36 @@
+"""
+Toplu "benzer ürünler": katalogdaki her SKU için en benzer k SKU (CSV / Parquet).
+
+    python similar_grlsz.py out.csv [--xlsx "Kod _n_ son grlsz.xlsx"] [--k 5] [--block 4096]
+
+Çıktı sütunları: sku, rank (1 = en benzer), similar_sku, distance. Aynı modelin diğer renkleri ve
+farklı cinsiyet ürünleri komşu sayılmaz. Katalog blok blok sorgulanıp yazılır.
+"""
+import argparse, time
+import numpy as np
+import helpers_grlsz as h
+from batch_grlsz import ChunkWriter
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("output")
+    ap.add_argument("--xlsx", default="Kod _n_ son grlsz.xlsx")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--block", type=int, default=4096, help="blok başına sorgulanan SKU sayısı")
+    args = ap.parse_args()
+
+    catalog = h.catalog_from_path(args.xlsx)
+    writer = ChunkWriter(args.output)
+    rows = 0
+    t0 = time.perf_counter()
+    try:
+        for start in range(0, len(catalog.norm), args.block):
+            table = catalog.similar_table(args.k, positions=np.arange(start, min(start + args.block, len(catalog.norm))))
+            writer.write(table)
+            rows += len(table)
+    finally:
+        writer.close()
+    print(f"{len(catalog.norm)} SKUs, {rows} rows -> {args.output} ({time.perf_counter() - t0:.2f} s)")
+
+if __name__ == "__main__":
+    main()